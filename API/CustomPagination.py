@@ -1,20 +1,245 @@
+import base64
+import hashlib
+import json
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Paginator as DjangoPaginator
+from django.db.models import Q
+from django.utils.functional import cached_property
 from django.http import JsonResponse
+from rest_framework.exceptions import NotFound
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class CachedCountPaginator(DjangoPaginator):
+    """
+    总数带 TTL 缓存的 Paginator, 缓存命中时不再执行 COUNT(*)
+    """
+
+    def __init__(self, object_list, per_page, cache_key=None, timeout=None, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.cache_key = cache_key
+        self.timeout = timeout
+
+    @cached_property
+    def count(self):
+        count = cache.get(self.cache_key)
+        if count is None:
+            count = super().count
+            cache.set(self.cache_key, count, timeout=self.timeout)
+        return count
 
 
 class CustomPagination(PageNumberPagination):
+    """
+    默认按页码分页, 总数来自按视图和过滤参数缓存的近似值(count_mode = 'cached').
+    客户端可以通过 ?count=none 只判断是否有下一页(多取一条), 完全不计算总数.
+    视图定义了 cursor_ordering 时, 客户端可以通过 ?cursor= 切换为游标(keyset)分页,
+    例如 cursor_ordering = ('-created', '-postID'), 游标记录上一页边界行的排序字段值,
+    翻页时用 WHERE (created, postID) < (...) 代替 OFFSET, 因此任意深度的翻页代价都相同.
+    总数缓存默认按 URL 参数和当前登录用户区分; 查询集与用户无关的公共列表定义 count_cache_per_user = False,
+    所有用户共享同一个缓存的总数.
+    """
     page_size = 10
     page_size_query_param = 'page_size'
     max_page_size = 1000
     page_query_param = 'page'
     last_page_strings = ('last',)
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    count_modes = ('cached', 'none')
+    count_cache_timeout = getattr(settings, 'PAGINATION_COUNT_CACHE_TIMEOUT', 60)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_ordering = getattr(view, 'cursor_ordering', None)
+        self.use_cursor = bool(self.cursor_ordering) and self.cursor_query_param in request.query_params
+        self.count_mode = request.query_params.get(self.count_query_param, self.count_modes[0])
+        if self.count_mode not in self.count_modes:
+            raise NotFound('Invalid count mode')
+        if self.use_cursor:
+            return self.paginate_queryset_by_cursor(queryset, request)
+        if self.count_mode == 'none':
+            return self.paginate_queryset_without_count(queryset, request)
+        self.django_paginator_class = partial(CachedCountPaginator, cache_key=self.get_count_cache_key(request, view),
+                                              timeout=self.count_cache_timeout)
+        return super().paginate_queryset(queryset, request, view)
 
     def get_paginated_response(self, data):
-        return JsonResponse({
+        return JsonResponse(self.get_paginated_data(data))
+
+    def get_paginated_data(self, data):
+        if self.use_cursor:
+            return {
+                'status': 'success',
+                'next': self.get_next_cursor_link(),
+                'previous': self.get_previous_cursor_link(),
+                'results': data,
+            }
+        if self.count_mode == 'none':
+            return {
+                'status': 'success',
+                'next': self.get_next_link_without_count(),
+                'previous': self.get_previous_link_without_count(),
+                'results': data,
+            }
+        return {
             'status': 'success',
             'count': self.page.paginator.count,
+            'count_approximate': True,
             'next': self.get_next_link(),
             'previous': self.get_previous_link(),
             'results': data,
-        })
+        }
+
+    # region count
+    def get_count_cache_key(self, request, view):
+        """
+        缓存键由视图名、URL 参数(例如板块 ID)和规范化后的过滤参数(查询参数与 POST 过滤条件)组成,
+        分页相关参数不参与; 视图没有声明 count_cache_per_user = False 时登录用户各自缓存
+        """
+        ignored = (self.page_query_param, self.page_size_query_param, self.cursor_query_param, self.count_query_param)
+        params = sorted((key, request.query_params.getlist(key)) for key in request.query_params if key not in ignored)
+        data = request.data if request.method == 'POST' else {}
+        body = sorted((key, str(value)) for key, value in data.items() if key not in ignored)
+        url_kwargs = getattr(request.resolver_match, 'kwargs', None) or getattr(view, 'kwargs', {})
+        parts = [params, body, sorted(url_kwargs.items())]
+        if getattr(view, 'count_cache_per_user', True) and request.user.is_authenticated:
+            parts.append(request.user.pk)
+        digest = hashlib.md5(json.dumps(parts, default=str).encode()).hexdigest()
+        return f'pagination_count:{view.__class__.__name__}:{digest}'
+
+    def paginate_queryset_without_count(self, queryset, request):
+        self.request = request
+        page_size = self.get_page_size(request)
+        try:
+            self.page_number = int(request.query_params.get(self.page_query_param, 1))
+            if self.page_number < 1:
+                raise ValueError
+        except ValueError:
+            raise NotFound('Invalid page')
+        offset = (self.page_number - 1) * page_size
+        # 多取一条用于判断是否还有下一页
+        rows = list(queryset[offset:offset + page_size + 1])
+        self.has_next_page = len(rows) > page_size
+        return rows[:page_size]
+
+    def get_next_link_without_count(self):
+        if not self.has_next_page:
+            return None
+        return replace_query_param(self.request.build_absolute_uri(), self.page_query_param, self.page_number + 1)
+
+    def get_previous_link_without_count(self):
+        if self.page_number <= 1:
+            return None
+        url = self.request.build_absolute_uri()
+        if self.page_number == 2:
+            return remove_query_param(url, self.page_query_param)
+        return replace_query_param(url, self.page_query_param, self.page_number - 1)
+    # endregion
+
+    # region cursor
+    def paginate_queryset_by_cursor(self, queryset, request):
+        self.request = request
+        self.cursor_page_size = self.get_page_size(request)
+        values, reverse = self.decode_cursor(request.query_params.get(self.cursor_query_param), queryset)
+
+        ordering = [(name.lstrip('-'), name.startswith('-')) for name in self.cursor_ordering]
+        if reverse:
+            # 向前翻页时反转排序方向取数据, 取出后再反转回来
+            ordering = [(name, not desc) for name, desc in ordering]
+        queryset = queryset.order_by(*[('-' if desc else '') + name for name, desc in ordering])
+        if values is not None:
+            queryset = queryset.filter(self.keyset_filter(ordering, values))
+
+        # 多取一条用于判断是否还有下一页
+        rows = list(queryset[:self.cursor_page_size + 1])
+        has_more = len(rows) > self.cursor_page_size
+        rows = rows[:self.cursor_page_size]
+        if reverse:
+            rows.reverse()
+
+        self.cursor_rows = rows
+        if reverse:
+            self.has_next_cursor = values is not None
+            self.has_previous_cursor = has_more
+        else:
+            self.has_next_cursor = has_more
+            self.has_previous_cursor = values is not None
+        return rows
+
+    @staticmethod
+    def keyset_filter(ordering, values):
+        """
+        构造 (f1, f2, ...) 在排序意义上位于 values 之后的条件, 以升序为例:
+        f1 > v1 OR (f1 = v1 AND f2 > v2) OR ...
+        """
+        condition = Q()
+        equal = Q()
+        for (name, desc), value in zip(ordering, values):
+            lookup = 'lt' if desc else 'gt'
+            condition |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+        return condition
+
+    def encode_cursor(self, row, reverse):
+        values = [getattr(row, name.lstrip('-')) for name in self.cursor_ordering]
+        # 时间按 str() 保留微秒精度, 解码时由模型字段的 to_python 还原
+        payload = json.dumps({'v': values, 'r': reverse}, default=str)
+        return base64.urlsafe_b64encode(payload.encode()).decode()
+
+    def decode_cursor(self, cursor, queryset):
+        if not cursor:
+            return None, False
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+            names = [name.lstrip('-') for name in self.cursor_ordering]
+            if len(payload['v']) != len(names):
+                raise ValueError
+            values = [self.get_cursor_field(queryset, name).to_python(value)
+                      for name, value in zip(names, payload['v'])]
+            return values, bool(payload.get('r'))
+        except Exception:
+            raise NotFound('Invalid cursor')
+
+    @staticmethod
+    def get_cursor_field(queryset, name):
+        # 排序字段可以是模型字段, 也可以是查询集上的注解
+        if name in queryset.query.annotations:
+            return queryset.query.annotations[name].output_field
+        return queryset.model._meta.get_field(name)
+
+    def get_cursor_link(self, cursor):
+        url = remove_query_param(self.request.build_absolute_uri(), self.page_query_param)
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def get_next_cursor_link(self):
+        if not self.has_next_cursor or not self.cursor_rows:
+            return None
+        return self.get_cursor_link(self.encode_cursor(self.cursor_rows[-1], False))
+
+    def get_previous_cursor_link(self):
+        if not self.has_previous_cursor or not self.cursor_rows:
+            return None
+        return self.get_cursor_link(self.encode_cursor(self.cursor_rows[0], True))
+    # endregion
+
+
+class NoCountPagination(CustomPagination):
+    """
+    只按页码判断是否有下一页, 不计算总数, 用于不能执行 COUNT(*) 的数据源(例如缓存中的时间线)
+    """
+    count_modes = ('none',)
+
+
+class KeysetPagination(CustomPagination):
+    """
+    始终使用游标分页且不计算总数, 用于可能很长的列表(例如用户的点赞、收藏), 视图必须定义 cursor_ordering
+    """
 
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_ordering = view.cursor_ordering
+        self.use_cursor = True
+        return self.paginate_queryset_by_cursor(queryset, request)
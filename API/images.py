@@ -0,0 +1,240 @@
+"""
+上传图片的读取与缩放, 帖子封面和用户头像共用
+
+解码前只读取文件头检查格式、字节数和像素数, 超过限制的图片在分配像素缓冲之前就被拒绝.
+JPEG 使用 draft 模式按 1/2、1/4、1/8 的比例直接解码为接近目标尺寸的图片, 原图的全尺寸像素缓冲不会出现在内存中;
+其他格式只能按原尺寸解码, 因此使用更低的像素上限.
+上传文件超过 FILE_UPLOAD_MAX_MEMORY_SIZE 时由 Django 保存在临时文件中, 这里直接按路径读取, 不复制到 BytesIO.
+峰值内存可以用 benchmark_image_ingest 命令测量.
+
+缩略图由进程内的线程池在后台生成(schedule), 结果以 {"source": 原图文件名, 尺寸名: {格式: 文件名}} 的形式
+记录在模型的 JSON 字段中, source 与当前原图不一致时说明缩略图已过期, 读取时回退到原图(pick_variant).
+"""
+import atexit
+import logging
+import math
+import os
+import posixpath
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from io import BytesIO
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from PIL import Image, ImageOps, UnidentifiedImageError
+from rest_framework import serializers
+
+logger = logging.getLogger('django')
+
+MAX_BYTES = getattr(settings, 'IMAGE_UPLOAD_MAX_BYTES', 10 * 1024 * 1024)
+# 可以按比例解码的格式(JPEG)的像素上限, 以及只能按原尺寸解码的格式的像素上限
+MAX_PIXELS = getattr(settings, 'IMAGE_UPLOAD_MAX_PIXELS', 50_000_000)
+MAX_FULL_DECODE_PIXELS = getattr(settings, 'IMAGE_UPLOAD_MAX_FULL_DECODE_PIXELS', 16_000_000)
+# 手机拍摄的 JPEG 可能被识别为 MPO
+FORMATS = ('JPEG', 'MPO', 'PNG', 'WEBP', 'GIF')
+DRAFT_FORMATS = ('JPEG', 'MPO')
+
+# EXIF 方向为这些值时图片需要旋转 90 度, 宽高互换
+TRANSPOSED_ORIENTATIONS = (5, 6, 7, 8)
+
+# 编码参数, 第一个为默认格式
+ENCODINGS = {
+    'jpeg': {'format': 'JPEG', 'quality': 80, 'optimize': True, 'progressive': True},
+    'webp': {'format': 'WEBP', 'quality': 75, 'method': 4},
+}
+
+WORKERS = getattr(settings, 'IMAGE_WORKERS', 2)
+
+_lock = threading.Lock()
+_executor = None
+_executor_pid = None
+
+
+@contextmanager
+def image_source(file):
+    """
+    :param file: 上传的文件或 FieldFile
+    :return: 可以交给 Image.open 的文件路径或文件对象, 尽量不把内容读入内存
+    """
+    if hasattr(file, 'temporary_file_path'):
+        yield file.temporary_file_path()
+        return
+    try:
+        path = file.path
+    except (AttributeError, NotImplementedError, ValueError):
+        path = None
+    if path is not None:
+        yield path
+        return
+    file.seek(0)
+    try:
+        yield file
+    finally:
+        file.seek(0)
+
+
+def check_header(image):
+    """
+    只根据文件头检查格式和像素数, 不解码
+    """
+    if image.format not in FORMATS:
+        raise ValidationError(f'Unsupported image format: {image.format}')
+    limit = MAX_PIXELS if image.format in DRAFT_FORMATS else MAX_FULL_DECODE_PIXELS
+    pixels = image.width * image.height
+    if pixels > limit:
+        raise ValidationError(f'Image is too large: {image.width}x{image.height} pixels, at most {limit} pixels')
+
+
+def validate_image(file):
+    """
+    上传图片的校验器, 检查字节数、格式和像素数, 并校验文件结构, 不解码像素
+    """
+    if file.size is not None and file.size > MAX_BYTES:
+        raise ValidationError(f'Image is too large: {file.size} bytes, at most {MAX_BYTES} bytes')
+    with image_source(file) as source:
+        try:
+            with Image.open(source) as image:
+                check_header(image)
+                image.verify()
+        except ValidationError:
+            raise
+        except (UnidentifiedImageError, Image.DecompressionBombError, OSError, SyntaxError) as e:
+            raise ValidationError(f'Invalid image: {e}')
+
+
+class ImageUploadField(serializers.FileField):
+    """
+    代替 serializers.ImageField: 不把内存中的上传文件复制到 BytesIO 再校验, 只读取文件头
+    """
+    default_validators = [validate_image]
+
+
+def draft_size(image, width):
+    """
+    :return: 使图片旋转后的宽度不小于 width 的原图尺寸
+    """
+    if image.getexif().get(0x0112) in TRANSPOSED_ORIENTATIONS:
+        return math.ceil(width * image.width / image.height), width
+    return width, math.ceil(width * image.height / image.width)
+
+
+def open_image(file, width=None, square=False):
+    """
+    读取图片并按 EXIF 方向旋转, 转换为 RGB 或 RGBA
+    :param file: 文件路径或文件对象
+    :param width: 需要的最大宽度, JPEG 按比例解码到不小于该宽度的最小尺寸
+    :param square: 之后会裁剪为正方形, 此时 width 是短边需要的长度
+    """
+    image = Image.open(file)
+    check_header(image)
+    if width is not None and image.format in DRAFT_FORMATS:
+        image.draft('RGB', (width, width) if square else draft_size(image, width))
+    image = ImageOps.exif_transpose(image)
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'transparency' in image.info or image.mode in ('LA', 'PA') else 'RGB')
+    return image
+
+
+def encode(image, fmt):
+    if fmt == 'jpeg' and image.mode == 'RGBA':
+        # JPEG 不支持透明通道, 铺白色背景
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A'))
+        image = background
+    output = BytesIO()
+    image.save(output, **ENCODINGS[fmt])
+    return output.getvalue()
+
+
+def render_variants(file, variants, upload_to, stem, square=False, storage=None):
+    """
+    将图片缩放为各个宽度并编码为各个格式, 保存到存储中
+    :param file: 原图文件
+    :param variants: {尺寸名: 宽度}
+    :param upload_to: 保存的目录
+    :param stem: 文件名前缀
+    :param square: 先从中间裁剪为正方形, 用于头像
+    :param storage: 保存缩略图的存储, 默认为 default_storage
+    :return: {尺寸名: {格式: 文件名}}
+    """
+    storage = storage or default_storage
+    with image_source(file) as source:
+        image = open_image(source, width=max(variants.values()), square=square)
+        image.load()
+    if square and image.width != image.height:
+        side = min(image.size)
+        left, top = (image.width - side) // 2, (image.height - side) // 2
+        image = image.crop((left, top, left + side, top + side))
+    result = {}
+    # 从大到小依次缩小, 每次都从上一级结果缩放, 减少重采样的像素数
+    current = image
+    for name, width in sorted(variants.items(), key=lambda item: -item[1]):
+        if current.width > width:
+            height = max(round(current.height * width / current.width), 1)
+            current = current.resize((width, height), Image.LANCZOS)
+        result[name] = {
+            fmt: storage.save(posixpath.join(upload_to, f'{stem}-{name}.{fmt}'), ContentFile(encode(current, fmt)))
+            for fmt in ENCODINGS
+        }
+    return result
+
+
+def variant_names(variants):
+    return [name for key, formats in (variants or {}).items() if key != 'source' for name in formats.values()]
+
+
+def delete_variants(variants):
+    for name in variant_names(variants):
+        try:
+            default_storage.delete(name)
+        except Exception:
+            logger.exception('failed to delete image variant %s', name)
+
+
+def pick_variant(variants, source, size, fmt=None):
+    """
+    :param source: 当前原图的文件名
+    :return: 缩略图的文件名, 缩略图未生成或已过期时为 None
+    """
+    variants = variants or {}
+    if not source or variants.get('source') != source:
+        return None
+    return variants.get(size, {}).get(fmt or next(iter(ENCODINGS)))
+
+
+def get_executor():
+    global _executor, _executor_pid
+    with _lock:
+        if _executor_pid != os.getpid():
+            # fork 后的子进程不能使用父进程的线程池
+            _executor = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix='image-variants')
+            _executor_pid = os.getpid()
+        return _executor
+
+
+def _run(func, *args):
+    try:
+        func(*args)
+    except Exception:
+        logger.exception('failed to process image: %s%r', func.__qualname__, args)
+    finally:
+        close_old_connections()
+
+
+def schedule(func, *args):
+    """
+    事务提交后在后台线程中执行 func(*args)
+    """
+    transaction.on_commit(lambda: get_executor().submit(_run, func, *args))
+
+
+def _shutdown():
+    if _executor is not None and _executor_pid == os.getpid():
+        _executor.shutdown(wait=True)
+
+
+atexit.register(_shutdown)
@@ -0,0 +1,169 @@
+"""
+上传文件(MEDIA_URL)的下载
+
+部署在 nginx / Apache 之后时设置 MEDIA_SENDFILE, 视图只检查路径并返回 X-Accel-Redirect 或 X-Sendfile 头,
+文件内容、Range 请求和条件请求都由前端服务器处理, Python 进程不读取文件.
+未设置时由视图直接返回文件:
+- 完整文件使用 FileResponse, WSGI 服务器支持 wsgi.file_wrapper 时以 sendfile 零拷贝发送
+- 支持单个区间的 Range 请求(206), 视频和音频可以拖动进度条; 多个区间时返回完整文件
+- ETag 由文件大小和修改时间生成, 支持 If-None-Match / If-Modified-Since / If-Range
+文件名不会被复用的目录(MEDIA_IMMUTABLE_PREFIXES, 即按内容寻址的 objects/)返回长期有效的 immutable 缓存头,
+其他文件的文件名在删除后可能被复用, 只缓存 MEDIA_CACHE_MAX_AGE 秒, 过期后用 ETag 重新验证.
+"""
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+from django.views.decorators.http import require_safe
+
+# None: 直接返回文件; 'x-accel-redirect': nginx; 'x-sendfile': Apache mod_xsendfile / lighttpd
+SENDFILE = getattr(settings, 'MEDIA_SENDFILE', None)
+# nginx 中对应 MEDIA_ROOT 的 internal location
+ACCEL_REDIRECT_LOCATION = getattr(settings, 'MEDIA_ACCEL_REDIRECT_LOCATION', '/protected-media/')
+CACHE_MAX_AGE = getattr(settings, 'MEDIA_CACHE_MAX_AGE', 60 * 60)
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+IMMUTABLE_PREFIXES = tuple(getattr(settings, 'MEDIA_IMMUTABLE_PREFIXES', ()))
+
+# 浏览器可以直接显示的类型, 其他类型作为附件下载
+INLINE_TYPES = ('image/', 'video/', 'audio/')
+STREAM_CHUNK_SIZE = 64 * 1024
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def cache_control(path):
+    if path.startswith(IMMUTABLE_PREFIXES):
+        return f'public, max-age={IMMUTABLE_MAX_AGE}, immutable'
+    return f'public, max-age={CACHE_MAX_AGE}'
+
+
+def guess_type(path):
+    file_type, encoding = mimetypes.guess_type(path)
+    if encoding:
+        # 例如 .gz, 按原样下载, 不让浏览器解压
+        return 'application/octet-stream'
+    return file_type or 'application/octet-stream'
+
+
+def set_headers(response, path, file_type):
+    response['Cache-Control'] = cache_control(path)
+    response['X-Content-Type-Options'] = 'nosniff'
+    if not file_type.startswith(INLINE_TYPES):
+        response['Content-Disposition'] = f"attachment; filename*=UTF-8''{quote(os.path.basename(path))}"
+    return response
+
+
+def parse_range(header, size):
+    """
+    :return: (起始位置, 结束位置(包含)), 不是单个区间时为 None
+    :raise ValueError: 区间不可满足
+    """
+    match = RANGE_RE.match(header.strip())
+    if not match or match.groups() == ('', ''):
+        return None
+    start, end = match.groups()
+    if start == '':
+        # bytes=-n: 最后 n 个字节
+        length = int(end)
+        if length == 0:
+            raise ValueError('empty suffix range')
+        return max(size - length, 0), size - 1
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size or start > end:
+        raise ValueError('unsatisfiable range')
+    return start, end
+
+
+def if_range_matches(request, etag, last_modified):
+    """
+    If-Range 与当前文件一致时才按 Range 返回部分内容, 否则返回完整文件
+    """
+    value = request.headers.get('If-Range')
+    if not value:
+        return True
+    if value.startswith(('"', 'W/')):
+        return value == etag
+    return parse_http_date_safe(value) == int(last_modified)
+
+
+def iter_range(file, start, length):
+    try:
+        file.seek(start)
+        while length > 0:
+            data = file.read(min(STREAM_CHUNK_SIZE, length))
+            if not data:
+                break
+            length -= len(data)
+            yield data
+    finally:
+        file.close()
+
+
+def sendfile_response(path, full_path, file_type):
+    response = HttpResponse(content_type=file_type)
+    if SENDFILE == 'x-accel-redirect':
+        response['X-Accel-Redirect'] = ACCEL_REDIRECT_LOCATION.rstrip('/') + '/' + quote(path)
+    else:
+        response['X-Sendfile'] = full_path
+    return set_headers(response, path, file_type)
+
+
+@require_safe
+def serve(request, path):
+    """
+    Serve an uploaded file under MEDIA_ROOT.
+    """
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404('File not found')
+    path = os.path.relpath(full_path, settings.MEDIA_ROOT).replace(os.sep, '/')
+    file_type = guess_type(path)
+    if SENDFILE:
+        return sendfile_response(path, full_path, file_type)
+
+    try:
+        stat = os.stat(full_path)
+    except (FileNotFoundError, NotADirectoryError):
+        raise Http404('File not found')
+    if not os.path.isfile(full_path):
+        raise Http404('File not found')
+    size = stat.st_size
+    etag = f'"{size:x}-{stat.st_mtime_ns:x}"'
+    not_modified = get_conditional_response(request, etag=etag, last_modified=int(stat.st_mtime))
+    if not_modified is not None:
+        not_modified['ETag'] = etag
+        return set_headers(not_modified, path, file_type)
+
+    byte_range = None
+    if 'Range' in request.headers and if_range_matches(request, etag, stat.st_mtime):
+        try:
+            byte_range = parse_range(request.headers['Range'], size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+
+    file = open(full_path, 'rb')
+    if byte_range is None:
+        response = FileResponse(file, content_type=file_type)
+        response['Content-Length'] = size
+    else:
+        # 部分内容只读取需要的区间, 不能交给 file_wrapper 发送整个文件
+        start, end = byte_range
+        response = StreamingHttpResponse(iter_range(file, start, end - start + 1), status=206,
+                                         content_type=file_type)
+        response['Content-Length'] = end - start + 1
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    return set_headers(response, path, file_type)
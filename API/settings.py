@@ -137,6 +137,34 @@ REST_FRAMEWORK = {
     ],
 }
 
+# 缓存: 响应缓存的版本号、板块时间线、分页总数和验证码都保存在缓存中, 必须在所有 worker 进程间共享,
+# 不能使用默认的 LocMemCache(每个进程一份, 一个进程中的更新其他进程看不到)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': config('REDIS_URL', default='redis://127.0.0.1:6379/1'),
+        'KEY_PREFIX': 'shaforum',
+    }
+}
+
+# 分页总数的缓存时间(秒)
+PAGINATION_COUNT_CACHE_TIMEOUT = 60
+
+# 帖子浏览量写回数据库的间隔(秒)
+POST_VIEWS_FLUSH_INTERVAL = 10
+
+# 参与热度计算的帖子时间范围(天)
+POST_HOT_WINDOW_DAYS = 30
+
+# 公共列表接口响应缓存的时间(秒), 数据变化时通过版本号失效
+RESPONSE_CACHE_TIMEOUT = 60
+
+# 每个板块时间线保存的最新帖子数
+PLATE_TIMELINE_LENGTH = 1000
+
+# 每个进程中生成封面、头像缩略图的后台线程数
+IMAGE_WORKERS = 2
+
 # 设置登录检查的URL
 LOGIN_URL = '/api/login/'
 
@@ -159,10 +187,33 @@ SIMPLE_JWT = {
 # 上传文件的路径
 MEDIA_URL = '/api/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# 上传文件按内容寻址保存并去重, 见 API.storage
+STORAGES = {
+    'default': {'BACKEND': 'API.storage.ContentAddressedStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+# 由前端服务器发送上传文件(见 API.media): None 为 Django 直接发送, 'x-accel-redirect' 为 nginx,
+# 'x-sendfile' 为 Apache mod_xsendfile; 使用 nginx 时需要将 MEDIA_ACCEL_REDIRECT_LOCATION 配置为指向 MEDIA_ROOT 的 internal location
+MEDIA_SENDFILE = None
+MEDIA_ACCEL_REDIRECT_LOCATION = '/protected-media/'
+# 上传文件的浏览器缓存时间(秒), 文件名不会被复用的目录使用一年的 immutable 缓存;
+# 上传文件和缩略图都保存在按内容寻址的 objects/ 下(见 API.storage)
+MEDIA_CACHE_MAX_AGE = 3600
+MEDIA_IMMUTABLE_PREFIXES = ('objects/',)
 
 # 上传文件的大小限制
 DATA_UPLOAD_MAX_MEMORY_SIZE = 10485760  # 10MB
-FILE_UPLOAD_MAX_MEMORY_SIZE = 10485760  # 10MB
+# 超过该大小的上传文件保存在临时文件中, 不占用内存
+FILE_UPLOAD_MAX_MEMORY_SIZE = 2621440  # 2.5MB
+# 上传图片的字节数和像素数限制, 见 API.images
+IMAGE_UPLOAD_MAX_BYTES = 10485760  # 10MB
+IMAGE_UPLOAD_MAX_PIXELS = 50000000
+IMAGE_UPLOAD_MAX_FULL_DECODE_PIXELS = 16000000
+# 帖子附件分块上传(见 posts.uploads): 未完成文件的目录、文件大小上限、建议和最大的分块大小
+CHUNKED_UPLOAD_DIR = os.path.join(BASE_DIR, 'tmp', 'uploads')
+CHUNKED_UPLOAD_MAX_SIZE = 2147483648  # 2GB
+CHUNKED_UPLOAD_CHUNK_SIZE = 5242880  # 5MB
+CHUNKED_UPLOAD_MAX_CHUNK_SIZE = 16777216  # 16MB
 
 # 上传文件的类型限制
 FILE_UPLOAD_ALLOWED_TYPES = [
@@ -257,4 +308,6 @@ CORS_ORIGIN_WHITELIST = [
 CORS_ALLOW_HEADERS = [
     'Content-Type',
     'Authorization',  # 添加 Authorization 到允许的请求头字段
+    'Content-Range',  # 分块上传
+    'X-Chunk-SHA256',
 ]
\ No newline at end of file
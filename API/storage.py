@@ -0,0 +1,99 @@
+"""
+按内容寻址的上传文件存储
+
+文件名由内容的 SHA-256 决定: objects/ab/cd/abcd....jpg, 按哈希前缀分为两级子目录, 单个目录中的文件数保持在可控范围.
+内容相同的上传只保存一份, 每次 save() 在 posts.MediaFile 中为该文件增加一个引用, 每次 delete() 减少一个引用,
+引用数降为 0 时在事务提交后删除文件, 因此 coverImg.delete()、avatar.delete() 和删除缩略图都只释放自己的引用.
+文件名随内容变化, 同名文件的内容永远不变, 下载时可以使用 immutable 缓存(见 API.media).
+不在 objects/ 下的旧文件没有引用计数, delete() 直接删除; 可以用 migrate_media_storage 命令迁移,
+引用计数与实际引用不一致或遗留孤儿文件时用 gc_media 命令修复.
+"""
+import hashlib
+import os
+import posixpath
+import re
+
+from django.apps import apps
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.db.models import F
+
+PREFIX = 'objects'
+EXTENSION_RE = re.compile(r'^\.[a-z0-9]{1,10}$')
+HASH_CHUNK_SIZE = 64 * 1024
+
+
+def media_files():
+    return apps.get_model('posts', 'MediaFile').objects
+
+
+def content_digest(content):
+    """
+    :return: (SHA-256, 字节数), 逐块读取, 不把文件读入内存
+    """
+    digest = hashlib.sha256()
+    size = 0
+    content.seek(0)
+    for chunk in content.chunks(HASH_CHUNK_SIZE):
+        digest.update(chunk)
+        size += len(chunk)
+    content.seek(0)
+    return digest.hexdigest(), size
+
+
+def hashed_name(digest, name):
+    extension = os.path.splitext(name or '')[1].lower()
+    if not EXTENSION_RE.match(extension):
+        extension = ''
+    return posixpath.join(PREFIX, digest[:2], digest[2:4], digest + extension)
+
+
+def is_hashed(name):
+    return name.startswith(PREFIX + '/')
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    按内容寻址、去重并带引用计数的文件系统存储
+    """
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        digest, size = content_digest(content)
+        name = hashed_name(digest, name)
+        with transaction.atomic():
+            media_file, created = media_files().select_for_update().get_or_create(name=name, defaults={'size': size})
+            media_files().filter(pk=media_file.pk).update(refcount=F('refcount') + 1)
+            if created or not self.exists(name):
+                self.write(name, content)
+        return name
+
+    def write(self, name, content):
+        saved = self._save(name, content)
+        if saved != name:
+            # 并发保存相同的内容时 _save 会改用其他文件名, 内容相同, 保留先写入的文件即可
+            super().delete(saved)
+
+    def delete(self, name):
+        if not name:
+            raise ValueError('The name must be given to delete().')
+        if not is_hashed(name):
+            return super().delete(name)
+        with transaction.atomic():
+            # 先锁住计数行再决定减少还是删除, 并发的 save() 会等待这里提交, 不会在两条语句之间增加引用
+            media_file = media_files().select_for_update().filter(name=name).first()
+            if media_file is not None and media_file.refcount > 1:
+                media_files().filter(pk=media_file.pk).update(refcount=F('refcount') - 1)
+                return
+            if media_file is not None:
+                media_file.delete()
+        # 最后一个引用已释放, 提交后确认没有被重新引用再删除文件
+        transaction.on_commit(lambda: self.collect(name))
+
+    def collect(self, name):
+        if not media_files().filter(name=name).exists():
+            super().delete(name)
@@ -14,17 +14,18 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
-from django.conf.urls.static import static
+import re
+
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
 
-from API import settings
+from API import media, settings
 
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("api/", include("posts.urls")),
     path("api/", include("users.urls")),
     path("api/", include("comments.urls")),
-]
-
-urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
+    # 上传的文件, 生产环境中交给前端服务器发送, 见 API.media
+    re_path(r"^%s(?P<path>.*)$" % re.escape(settings.MEDIA_URL.lstrip("/")), media.serve, name="media"),
+]
\ No newline at end of file
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.6 on 2026-10-17 10:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('comments', '0003_alter_comment_parent_likeusercomment_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['author', 'post', 'created'], name='comment_author_post_idx'),
+        ),
+    ]
@@ -1,7 +1,35 @@
+from mptt.managers import TreeManager
 from mptt.models import MPTTModel, TreeForeignKey
+from mptt.querysets import TreeQuerySet
 from users.models import User
 from posts.models import Post
 from django.db import models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_subquery(queryset, field):
+    """
+    相关记录数的标量子查询, 与外层查询一起执行
+    """
+    counts = queryset.filter(**{field: OuterRef('pk')}).order_by().values(field).annotate(total=Count('pk'))
+    return Coalesce(Subquery(counts.values('total')), 0)
+
+
+class CommentQuerySet(TreeQuerySet):
+    """
+    QuerySet for Comment
+    """
+
+    def thread(self):
+        """
+        评论列表使用的查询集: 作者、被回复者通过 join 取出, 点赞数、收藏数、回复数用子查询在同一条 SQL 中算出
+        """
+        return self.select_related('author', 'reply_to').annotate(
+            like_total=count_subquery(LikeUserComment.objects.all(), 'comment'),
+            collect_total=count_subquery(CollectUserComment.objects.all(), 'comment'),
+            reply_total=count_subquery(Comment.objects.all(), 'parent'),
+        )
 
 
 class Comment(MPTTModel):
@@ -27,6 +55,14 @@ class Comment(MPTTModel):
     # whoLikes = models.ManyToManyField(User, through='models.models.py', verbose_name='点赞用户')
     # whoCollects = models.ManyToManyField(User, through='models.CollectUserComment', verbose_name='收藏用户')
 
+    objects = TreeManager.from_queryset(CommentQuerySet)()
+
+    class Meta:
+        # 用户评论过的帖子按最后评论时间分组排序, 索引覆盖该查询
+        indexes = [
+            models.Index(fields=['author', 'post', 'created'], name='comment_author_post_idx'),
+        ]
+
     class MPTTMeta:
         order_insertion_by = ['created']
 
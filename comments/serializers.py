@@ -1,9 +1,11 @@
 from rest_framework import serializers
 from users.descSerializers import UserDescSerializer
 from comments.models import Comment
+from posts.interactions import InteractionSerializerMixin
 
 
-class CommentSerializer(serializers.ModelSerializer):
+class CommentSerializer(InteractionSerializerMixin, serializers.ModelSerializer):
+    interaction_kind = "comment"
     author = UserDescSerializer()
     reply_to = UserDescSerializer()
     like_count = serializers.SerializerMethodField()
@@ -31,21 +33,22 @@ class CommentSerializer(serializers.ModelSerializer):
         )
         read_only_fields = ("__all__",)
 
+    # 查询集来自 Comment.objects.thread() 时直接使用注解的计数, 否则逐条计数
     def get_like_count(self, obj):
+        if hasattr(obj, "like_total"):
+            return obj.like_total
         return obj.whoLikes.count()
 
     def get_collect_count(self, obj):
+        if hasattr(obj, "collect_total"):
+            return obj.collect_total
         return obj.whoCollects.count()
 
     def get_reply_count(self, obj):
+        if hasattr(obj, "reply_total"):
+            return obj.reply_total
         return obj.childComments.count()
 
-    def get_has_liked(self, obj):
-        return obj.whoLikes.filter(user_id=self.context["request"].user).exists()
-
-    def get_has_collected(self, obj):
-        return obj.whoCollects.filter(user_id=self.context["request"].user).exists()
-
 
 class CommentCreateSerializer(serializers.ModelSerializer):
     class Meta:
@@ -0,0 +1,16 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from comments.models import Comment
+from posts.signals import increase_post_counter, decrease_post_counter
+
+
+@receiver(post_save, sender=Comment)
+def increase_comment_count(sender, instance, created, **kwargs):
+    if created:
+        increase_post_counter(instance.post_id, 'comment_count')
+
+
+@receiver(post_delete, sender=Comment)
+def decrease_comment_count(sender, instance, **kwargs):
+    decrease_post_counter(instance.post_id, 'comment_count')
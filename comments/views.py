@@ -38,6 +38,7 @@ class CommentListView(ListAPIView):
     serializer_class = CommentListSerializer
     permission_classes = (IsAuthenticatedOrReadOnly,)
     pagination_class = CustomPagination
+    count_cache_per_user = False
     filter_backends = [DjangoFilterBackend]
     filter_fields = {
         "post": ["exact"],
@@ -0,0 +1,284 @@
+"""
+JSONL 批量导入
+
+输入每行一个 JSON 对象, 格式与 export_ndjson 的输出相同: {"type": "post", "data": {...}}.
+支持的类型: user, post(data 中的 tags 为标签名列表), comment, post_like, post_collect, comment_like, comment_collect,
+notification 行会被跳过(通知由导入后的新操作产生, 不恢复历史通知).
+各类型分别缓冲, 任一缓冲满 batch_size 行时按依赖顺序(用户 -> 帖子 -> 评论 -> 点赞/收藏)整体 bulk_create,
+因此输入只需保证被引用的行出现在引用它的行之前(例如父评论在子评论之前), export_ndjson 的输出满足这一点.
+
+- 用户按用户名匹配, 已存在的用户直接复用, 新用户由数据库分配ID, 其余行中的用户ID按映射替换;
+  export_ndjson 不导出密码和邮箱, 新用户没有可用密码, 邮箱为占位地址 <用户名>@import.invalid
+- 文件中没有对应 user 行的用户ID按原值使用, 必须是数据库中已有的用户(例如导回原库), 否则导入失败
+- 帖子、评论、点赞、收藏保留文件中的主键, 与已有数据冲突时该批失败
+- 创建时间等时间字段保留文件中的值, 缺省时为导入时间
+- 不触发信号, 不发送通知; 评论的 MPTT 树、帖子计数、标签索引、全文索引和热度在全部导入后统一重建
+"""
+import time
+from contextlib import contextmanager
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group
+from django.contrib.contenttypes.models import ContentType
+from django.core.management import call_command
+from django.db import models, transaction
+from django.utils import timezone
+from taggit.models import Tag, TaggedItem
+
+from comments.models import Comment, LikeUserComment, CollectUserComment
+from posts import hot, responsecache, search, tagindex, timeline
+from posts.models import Post, LikeUserPost, CollectUserPost
+from users.models import User
+
+BATCH_SIZE = 1000
+
+# 按依赖顺序排列, 写入时也按这个顺序
+MODELS = (
+    ('user', User),
+    ('post', Post),
+    ('comment', Comment),
+    ('post_like', LikeUserPost),
+    ('post_collect', CollectUserPost),
+    ('comment_like', LikeUserComment),
+    ('comment_collect', CollectUserComment),
+)
+TYPES = tuple(name for name, _ in MODELS)
+# 可以出现在输入中但不导入的类型
+SKIPPED_TYPES = ('notification',)
+
+# 没有邮箱的用户使用的占位邮箱, 邮箱字段唯一, 按用户名区分
+PLACEHOLDER_EMAIL = '{username}@import.invalid'
+
+# 各模型中引用用户的字段
+USER_FIELDS = {
+    Post: ('author_id',),
+    Comment: ('author_id', 'reply_to_id'),
+    LikeUserPost: ('user_id',),
+    CollectUserPost: ('user_id',),
+    LikeUserComment: ('user_id',),
+    CollectUserComment: ('user_id',),
+}
+
+# 评论的 MPTT 字段在导入后重建, 写入时先填占位值
+MPTT_FIELDS = ('lft', 'rght', 'tree_id', 'level')
+
+
+@contextmanager
+def preserve_timestamps(*model_classes):
+    """
+    暂时关闭 auto_now / auto_now_add, 使 bulk_create 写入文件中的时间
+    """
+    saved = []
+    for model in model_classes:
+        for field in model._meta.concrete_fields:
+            if isinstance(field, models.DateField) and (field.auto_now or field.auto_now_add):
+                saved.append((field, field.auto_now, field.auto_now_add))
+                field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class Importer:
+    """
+    将 JSONL 行分批写入数据库
+    """
+
+    def __init__(self, batch_size=BATCH_SIZE, stdout=None):
+        self.batch_size = batch_size
+        self.stdout = stdout
+        self.buffers = {name: [] for name in TYPES}
+        self.user_ids = {}
+        self.counts = {name: 0 for name in TYPES}
+        self.skipped = 0
+        self.plate_ids = set()
+        self.started = time.monotonic()
+        self.now = timezone.now()
+        self.fields = {
+            model: {field.attname: field for field in model._meta.concrete_fields} for _, model in MODELS
+        }
+        self.timestamp_fields = {
+            model: [field.attname for field in model._meta.concrete_fields
+                    if isinstance(field, models.DateField) and (field.auto_now or field.auto_now_add)]
+            for _, model in MODELS
+        }
+
+    @property
+    def total(self):
+        return sum(self.counts.values())
+
+    def rate(self):
+        elapsed = time.monotonic() - self.started
+        return self.total / elapsed if elapsed else 0
+
+    def add(self, line):
+        """
+        :param line: 解析后的一行, {"type": ..., "data": {...}}
+        """
+        name = line.get('type')
+        if name in SKIPPED_TYPES:
+            self.skipped += 1
+            return
+        if name not in self.buffers:
+            raise ValueError(f'Unknown type: {name}')
+        self.buffers[name].append(line['data'])
+        if len(self.buffers[name]) >= self.batch_size:
+            self.flush()
+
+    def build(self, model, data):
+        fields = self.fields[model]
+        values = {}
+        for key, value in data.items():
+            if key in fields and value is not None:
+                values[key] = fields[key].to_python(value)
+        for name in self.timestamp_fields[model]:
+            values.setdefault(name, self.now)
+        for key in USER_FIELDS.get(model, ()):
+            if values.get(key) is not None:
+                # 导入的用户按映射替换, 其余用户ID已由 resolve_users 确认存在于数据库中
+                if values[key] not in self.user_ids:
+                    raise ValueError(f'{model.__name__}.{key} refers to user {values[key]}, '
+                                     f'which is neither among the imported user rows nor in the database')
+                values[key] = self.user_ids[values[key]]
+        return model(**values)
+
+    def flush(self):
+        """
+        按依赖顺序写入全部缓冲
+        """
+        buffers, self.buffers = self.buffers, {name: [] for name in TYPES}
+        with transaction.atomic(), preserve_timestamps(*(model for _, model in MODELS)):
+            for name, model in MODELS:
+                rows = buffers[name]
+                if rows:
+                    getattr(self, f'create_{name}s', self.create_rows)(model, rows)
+                    self.counts[name] += len(rows)
+                if model is User:
+                    # 用户写入后映射已完整, 再确认其余用户ID
+                    self.resolve_users(buffers)
+        if self.stdout is not None:
+            self.stdout.write(f'{self.total} rows imported ({self.rate():.0f} rows/s)')
+
+    def resolve_users(self, buffers):
+        """
+        文件中没有对应 user 行的用户ID, 数据库中存在时按原值使用, 每批一次查询
+        """
+        source_ids = {data.get(key) for name, model in MODELS for data in buffers[name]
+                      for key in USER_FIELDS.get(model, ())}
+        source_ids = {int(user_id) for user_id in source_ids if user_id is not None} - set(self.user_ids)
+        if not source_ids:
+            return
+        for user_id in User.objects.filter(pk__in=source_ids).values_list('userID', flat=True):
+            self.user_ids[user_id] = user_id
+
+    def create_rows(self, model, rows):
+        model.objects.bulk_create([self.build(model, data) for data in rows], batch_size=self.batch_size)
+
+    def create_users(self, model, rows):
+        usernames = [data['username'] for data in rows]
+        existing = dict(User.objects.filter(username__in=usernames).values_list('username', 'userID'))
+        users = []
+        for data in rows:
+            data = dict(data)
+            source_id = data.pop('userID', None)
+            if data['username'] in existing:
+                if source_id is not None:
+                    self.user_ids[source_id] = existing[data['username']]
+                continue
+            data.setdefault('password', make_password(None))
+            if not data.get('email'):
+                data['email'] = PLACEHOLDER_EMAIL.format(username=data['username'])
+            user = self.build(User, data)
+            user._source_id = source_id
+            users.append(user)
+        User.objects.bulk_create(users, batch_size=self.batch_size)
+
+        # MySQL 的 bulk_create 不返回自增主键, 按用户名查回
+        created = dict(User.objects.filter(username__in=[user.username for user in users])
+                       .values_list('username', 'userID'))
+        for user in users:
+            if user._source_id is not None:
+                self.user_ids[user._source_id] = created[user.username]
+        # User.save() 会把新用户加入 uestcer 组, 这里批量补上
+        group, _ = Group.objects.get_or_create(name='uestcer')
+        User.groups.through.objects.bulk_create(
+            [User.groups.through(user_id=user_id, group_id=group.pk) for user_id in created.values()],
+            batch_size=self.batch_size,
+        )
+
+    def create_posts(self, model, rows):
+        posts = []
+        tags = {}
+        for data in rows:
+            post = self.build(Post, data)
+            if post.pk is None:
+                raise ValueError('post rows need a postID')
+            post.render_md()
+            posts.append(post)
+            tags[post.pk] = data.get('tags') or []
+            self.plate_ids.add(post.plate_id)
+        Post.objects.bulk_create(posts, batch_size=self.batch_size)
+        self.create_tags(tags)
+
+    def create_tags(self, post_tags):
+        names = {name for names in post_tags.values() for name in names}
+        if not names:
+            return
+        tag_ids = dict(Tag.objects.filter(name__in=names).values_list('name', 'id'))
+        missing = sorted(names - set(tag_ids))
+        if missing:
+            used = set(Tag.objects.values_list('slug', flat=True))
+            new_tags = []
+            for name in missing:
+                tag = Tag(name=name)
+                slug, i = tag.slugify(name), 1
+                while slug in used:
+                    slug = tag.slugify(name, i)
+                    i += 1
+                tag.slug = slug
+                used.add(slug)
+                new_tags.append(tag)
+            Tag.objects.bulk_create(new_tags, batch_size=self.batch_size)
+            tag_ids.update(Tag.objects.filter(name__in=missing).values_list('name', 'id'))
+        content_type = ContentType.objects.get_for_model(Post)
+        TaggedItem.objects.bulk_create(
+            [TaggedItem(tag_id=tag_ids[name], content_type=content_type, object_id=post_id)
+             for post_id, names in post_tags.items() for name in set(names)],
+            batch_size=self.batch_size,
+        )
+
+    def create_comments(self, model, rows):
+        comments = []
+        for data in rows:
+            comment = self.build(Comment, {key: value for key, value in data.items() if key not in MPTT_FIELDS})
+            for field in MPTT_FIELDS:
+                setattr(comment, field, 0)
+            comments.append(comment)
+        Comment.objects.bulk_create(comments, batch_size=self.batch_size)
+
+    def finish(self, rebuild=True):
+        """
+        写入剩余缓冲, 重建导入时跳过的派生数据
+        """
+        self.flush()
+        if not rebuild:
+            return
+        steps = []
+        if self.counts['comment']:
+            steps.append(('comment trees', Comment.objects.rebuild))
+        if self.counts['post'] or self.counts['comment'] or self.counts['post_like'] or self.counts['post_collect']:
+            steps.append(('post counters', lambda: call_command('reconcile_post_counters', stdout=self.stdout)))
+        if self.counts['post']:
+            steps.append(('tag index', tagindex.rebuild_index))
+            steps.append(('search index', search.rebuild_index))
+            steps.append(('hot scores', hot.update_hot_scores))
+            steps.append(('plate timelines', lambda: [timeline.build(plate_id) for plate_id in self.plate_ids]))
+        steps.append(('response cache', lambda: responsecache.bump_version(
+            responsecache.POSTS_VERSION, *(responsecache.plate_version(plate_id) for plate_id in self.plate_ids))))
+        for label, step in steps:
+            started = time.monotonic()
+            step()
+            if self.stdout is not None:
+                self.stdout.write(f'rebuilt {label} in {time.monotonic() - started:.1f}s')
@@ -0,0 +1,71 @@
+"""
+条件请求(ETag / Last-Modified)
+
+详情类接口用一次轻量查询(或缓存中的版本号)算出校验值, 与请求头 If-None-Match 比较, 未变化时直接返回 304,
+不再读取和序列化完整数据; 列表接口的响应本身已经缓存, 用响应内容的哈希作为校验值, 未变化时省去传输.
+响应中的点赞/收藏状态因用户而异, 因此校验值包含当前用户, 并设置 Vary: Authorization.
+Last-Modified 仅作参考: 计数和点赞状态的变化不会更新 last_modified, 是否返回 304 以 ETag 为准.
+"""
+import hashlib
+
+from django.http import JsonResponse
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+
+def make_etag(*parts):
+    return quote_etag(hashlib.md5(repr(parts).encode()).hexdigest())
+
+
+def is_failure(response):
+    """
+    接口出错时同样以 200 返回 {"status": "fail", ...}, 这类响应不能带校验值, 否则之后的请求会被 304 为错误结果
+    """
+    return getattr(response, 'content', b'').startswith(b'{"status": "fail"')
+
+
+class ConditionalGetMixin:
+    """
+    为 GET 接口提供 ETag 校验与 Cache-Control / Vary 响应头
+    """
+    # 客户端可以保存响应, 但每次使用前都要向服务器重新校验
+    conditional_cache_control = {'private': True, 'no_cache': True}
+    conditional_vary = ('Authorization',)
+
+    etag = None
+    last_modified = None
+
+    def get_validators(self, request):
+        """
+        :return: (etag, last_modified), 资源不存在时返回 (None, None)
+        """
+        return None, None
+
+    def not_modified(self, request):
+        """
+        校验值未变化时返回 304 响应, 否则返回 None
+        """
+        self.etag, self.last_modified = self.get_validators(request)
+        if self.etag is None:
+            return None
+        return get_conditional_response(request, etag=self.etag)
+
+    def conditional_json(self, request, payload):
+        """
+        以响应内容的哈希作为 ETag 返回 JsonResponse, 与 If-None-Match 一致时返回 304
+        """
+        response = JsonResponse(payload)
+        self.etag = quote_etag(hashlib.md5(response.content).hexdigest())
+        return get_conditional_response(request, etag=self.etag, response=response)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if request.method not in ('GET', 'HEAD'):
+            return response
+        if self.etag is not None and response.status_code in (200, 304) and not is_failure(response):
+            response['ETag'] = self.etag
+            if self.last_modified is not None:
+                response['Last-Modified'] = http_date(self.last_modified.timestamp())
+        patch_cache_control(response, **self.conditional_cache_control)
+        patch_vary_headers(response, self.conditional_vary)
+        return response
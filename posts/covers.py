@@ -0,0 +1,67 @@
+"""
+帖子封面的多尺寸图片
+
+上传封面时只保存原图, 请求立即返回; 事务提交后由 API.images 的线程池在后台生成固定宽度的
+thumb / card / full 三种尺寸, 每种尺寸各编码为 WebP 和 JPEG, 结果记录在 Post.cover_variants 中:
+{"source": 原图文件名, "thumb": {"webp": 文件名, "jpeg": 文件名}, ...}
+source 与当前的 coverImg 不一致时(处理中、处理失败或已更换封面)说明缩略图已过期, 读取时回退到原图.
+已有封面可以用 process_covers 命令批量生成.
+"""
+import posixpath
+import secrets
+
+from django.utils import timezone
+
+from API import images
+from posts import responsecache
+from posts.models import Post
+
+# 各尺寸的宽度(像素), 原图更窄时不放大
+VARIANTS = {
+    'thumb': 240,
+    'card': 640,
+    'full': 1280,
+}
+UPLOAD_TO = 'covers/variants'
+
+
+def get_variant(post, size, fmt=None):
+    """
+    :return: 缩略图的文件名, 缩略图未生成或已过期时为 None
+    """
+    return images.pick_variant(post.cover_variants, post.coverImg.name, size, fmt)
+
+
+def process(post_id, force=False):
+    """
+    为帖子当前的封面生成缩略图, 封面在处理期间被更换时丢弃结果
+    :param force: 缩略图已是最新时也重新生成, 例如修改了尺寸或编码参数之后
+    :return: 是否生成了缩略图
+    """
+    post = Post.objects.filter(pk=post_id).only('postID', 'plate_id', 'coverImg', 'cover_variants').first()
+    if post is None or not post.coverImg:
+        return False
+    source = post.coverImg.name
+    if not force and (post.cover_variants or {}).get('source') == source:
+        return False
+    # 文件名带随机后缀, 删除后也不会被复用, 可以长期缓存(见 API.media)
+    stem = f'{post.pk}-{posixpath.splitext(posixpath.basename(source))[0]}-{secrets.token_hex(4)}'
+    variants = images.render_variants(post.coverImg, VARIANTS, UPLOAD_TO, stem)
+    variants['source'] = source
+    # 用条件更新代替 save(), 不触发信号, 也不会覆盖并发修改的其他字段;
+    # update() 不会更新 auto_now 字段, 手动设置 last_modified, 详情页的 ETag 随之变化, 不会继续返回旧的缩略图地址
+    updated = Post.objects.filter(pk=post.pk, coverImg=source).update(
+        cover_variants=variants, last_modified=timezone.now())
+    if not updated:
+        images.delete_variants(variants)
+        return False
+    images.delete_variants(post.cover_variants)
+    responsecache.bump_version(responsecache.POSTS_VERSION, responsecache.plate_version(post.plate_id))
+    return True
+
+
+def schedule(post):
+    """
+    事务提交后在后台生成帖子封面的缩略图
+    """
+    images.schedule(process, post.pk)
@@ -0,0 +1,124 @@
+"""
+NDJSON 数据导出
+
+按类型依次导出用户、帖子、评论(包含 MPTT 树字段)、点赞、收藏和通知, 每行一个 JSON 对象:
+{"type": "post", "pk": 1, "data": {...}}
+每种类型按主键升序分批读取, 每批 chunk_size 行, 用 iterator() 逐行序列化, 内存占用与表的大小无关.
+(MySQL 驱动不支持服务端游标, iterator() 仍会一次取回整个结果集, 因此按主键分批限制每次取回的行数.)
+导出中断后, 以最后一行的 "类型:主键" 作为 cursor 即可从断点继续.
+用户只导出 USER_FIELDS 中的公开资料, 不导出密码哈希、邮箱、权限和联系方式, 导出文件可以用 import_jsonl 导入
+(用户按用户名匹配, 新用户没有密码, 需要重置密码后登录; 通知不会导入).
+"""
+import json
+import zlib
+
+from notifications.models import Notification
+
+from comments.models import Comment, LikeUserComment, CollectUserComment
+from posts.models import Post, PostTag, LikeUserPost, CollectUserPost
+from users.models import User
+
+CHUNK_SIZE = 2000
+
+# 导出的类型及顺序
+EXPORTS = (
+    ('user', User),
+    ('post', Post),
+    ('comment', Comment),
+    ('post_like', LikeUserPost),
+    ('post_collect', CollectUserPost),
+    ('comment_like', LikeUserComment),
+    ('comment_collect', CollectUserComment),
+    ('notification', Notification),
+)
+TYPES = tuple(name for name, _ in EXPORTS)
+
+# 用户导出的字段, 其他模型导出全部字段
+USER_FIELDS = ('userID', 'username', 'first_name', 'last_name', 'is_active', 'date_joined', 'sex', 'college',
+               'major', 'status')
+
+
+def encode_value(value):
+    # 时间保留微秒精度, 其他类型(Decimal、UUID 等)转为字符串
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return str(value)
+
+
+def parse_cursor(cursor):
+    """
+    :param cursor: "类型:主键", 从该行之后继续导出
+    :return: (类型, 主键), 未指定时为 (None, None)
+    """
+    if not cursor:
+        return None, None
+    name, _, pk = cursor.partition(':')
+    if name not in TYPES:
+        raise ValueError(f'Invalid cursor type: {name}')
+    return name, int(pk)
+
+
+def add_tags(rows):
+    """
+    为一批帖子补充标签名, 每批一次查询
+    """
+    tags = {}
+    post_ids = [row['postID'] for row in rows]
+    for post_id, name in PostTag.objects.filter(post_id__in=post_ids).values_list('post_id', 'tag__name'):
+        tags.setdefault(post_id, []).append(name)
+    for row in rows:
+        row['tags'] = tags.get(row['postID'], [])
+
+
+def iter_rows(model, after=None, chunk_size=CHUNK_SIZE):
+    """
+    按主键升序逐行读取一张表的全部字段
+    """
+    pk_name = model._meta.pk.attname
+    fields = USER_FIELDS if model is User else [field.attname for field in model._meta.concrete_fields]
+    queryset = model._default_manager.order_by(pk_name).values(*fields)
+    last_pk = after
+    while True:
+        batch = queryset.filter(**{f'{pk_name}__gt': last_pk}) if last_pk is not None else queryset
+        rows = list(batch[:chunk_size].iterator(chunk_size=chunk_size))
+        if not rows:
+            return
+        if model is Post:
+            add_tags(rows)
+        yield from rows
+        last_pk = rows[-1][pk_name]
+
+
+def iter_lines(types=TYPES, cursor=None, chunk_size=CHUNK_SIZE):
+    """
+    逐行生成 NDJSON
+    :param types: 导出的类型
+    :param cursor: 断点, 见 parse_cursor
+    """
+    resume_type, resume_pk = parse_cursor(cursor)
+    started = resume_type is None
+    for name, model in EXPORTS:
+        after = None
+        if not started:
+            if name != resume_type:
+                continue
+            started = True
+            after = resume_pk
+        if name not in types:
+            continue
+        pk_name = model._meta.pk.attname
+        for row in iter_rows(model, after=after, chunk_size=chunk_size):
+            line = {'type': name, 'pk': row[pk_name], 'data': row}
+            yield json.dumps(line, default=encode_value, ensure_ascii=False) + '\n'
+
+
+def gzip_stream(lines, level=6):
+    """
+    将逐行生成的文本压缩为 gzip 数据块
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for line in lines:
+        data = compressor.compress(line.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
@@ -0,0 +1,62 @@
+"""
+帖子热度
+
+热度 = (浏览、点赞、收藏、评论的加权和 + 1) / (发布小时数 + 2) ^ GRAVITY, 随时间衰减.
+只有最近 POST_HOT_WINDOW_DAYS 天内的帖子参与计算, 更早的帖子热度置为 0.
+热度保存在带索引的 Post.hot_score 中, 热门列表(全站或按板块)只需按索引顺序读取.
+新帖子在 Post.save() 中得到初始热度, 之后由 update_hot_scores 命令定时(例如 crontab 每 10 分钟)重新计算.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from posts import responsecache
+from posts.models import Post, Plate
+
+VIEW_WEIGHT = 0.2
+LIKE_WEIGHT = 3
+COLLECT_WEIGHT = 5
+COMMENT_WEIGHT = 2
+GRAVITY = 1.8
+
+WINDOW_DAYS = getattr(settings, 'POST_HOT_WINDOW_DAYS', 30)
+
+
+def hot_score(views, likes, collects, comments, created, now):
+    points = views * VIEW_WEIGHT + likes * LIKE_WEIGHT + collects * COLLECT_WEIGHT + comments * COMMENT_WEIGHT
+    age_hours = max((now - created).total_seconds() / 3600, 0)
+    return (points + 1) / (age_hours + 2) ** GRAVITY
+
+
+def update_hot_scores(batch_size=1000, now=None):
+    """
+    分批重新计算最近帖子的热度, 每批一次查询取出冗余计数, 一次 bulk_update 写回
+    :return: 更新的帖子数
+    """
+    now = now or timezone.now()
+    cutoff = now - timedelta(days=WINDOW_DAYS)
+    Post.objects.filter(created__lt=cutoff, hot_score__gt=0).update(hot_score=0)
+
+    queryset = Post.objects.filter(created__gte=cutoff).order_by('postID').values_list(
+        'postID', 'views', 'like_count', 'collect_count', 'comment_count', 'created')
+
+    total = 0
+    last_id = 0
+    while True:
+        rows = list(queryset.filter(postID__gt=last_id)[:batch_size])
+        if not rows:
+            break
+        posts = [
+            Post(postID=post_id, hot_score=hot_score(views, likes, collects, comments, created, now))
+            for post_id, views, likes, collects, comments, created in rows
+        ]
+        with transaction.atomic():
+            Post.objects.bulk_update(posts, ['hot_score'])
+        total += len(posts)
+        last_id = rows[-1][0]
+    # 热门列表的顺序已变化, 使全站和各板块的列表缓存失效
+    responsecache.bump_version(responsecache.POSTS_VERSION, *(
+        responsecache.plate_version(plate_id) for plate_id in Plate.objects.values_list('plateID', flat=True)))
+    return total
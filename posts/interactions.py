@@ -0,0 +1,92 @@
+"""
+当前用户的点赞/收藏状态
+
+一次请求内共享一个 UserInteractions, 序列化一页帖子或评论时, 第一次查询某个对象的状态就把整页对象的
+点赞、收藏状态一次取出(点赞与收藏用 UNION 合并为一条查询), 之后的对象直接在内存中判断.
+"""
+from django.db.models import Value
+from django.db.models.manager import BaseManager
+from rest_framework import serializers
+
+from comments.models import LikeUserComment, CollectUserComment
+from posts.models import LikeUserPost, CollectUserPost
+
+LIKE = 'like'
+COLLECT = 'collect'
+
+
+class UserInteractions:
+    """
+    当前用户对帖子和评论的点赞、收藏状态
+    """
+
+    def __init__(self, user):
+        self.user = user
+        self.loaded = {'post': set(), 'comment': set()}
+        self.states = {'post': {LIKE: set(), COLLECT: set()}, 'comment': {LIKE: set(), COLLECT: set()}}
+
+    def load(self, kind, ids):
+        """
+        批量读取一组帖子或评论的状态, 已读取过的对象不再查询
+        :param kind: 'post' 或 'comment'
+        """
+        ids = set(ids) - self.loaded[kind]
+        if not ids:
+            return
+        self.loaded[kind] |= ids
+        if not self.user.is_authenticated:
+            return
+        if kind == 'post':
+            like_model, collect_model, field = LikeUserPost, CollectUserPost, 'post_id'
+        else:
+            like_model, collect_model, field = LikeUserComment, CollectUserComment, 'comment_id'
+        liked = like_model.objects.filter(user=self.user, **{f'{field}__in': ids}).order_by().annotate(
+            action=Value(LIKE)).values_list(field, 'action')
+        collected = collect_model.objects.filter(user=self.user, **{f'{field}__in': ids}).order_by().annotate(
+            action=Value(COLLECT)).values_list(field, 'action')
+        for object_id, action in liked.union(collected, all=True):
+            self.states[kind][action].add(object_id)
+
+    def has(self, kind, action, object_id):
+        self.load(kind, [object_id])
+        return object_id in self.states[kind][action]
+
+
+def get_interactions(request):
+    """
+    获取当前请求共享的 UserInteractions
+    """
+    interactions = getattr(request, '_interactions', None)
+    if interactions is None:
+        interactions = UserInteractions(request.user)
+        request._interactions = interactions
+    return interactions
+
+
+class InteractionSerializerMixin:
+    """
+    为序列化器提供 has_liked / has_collected 的批量判断, 子类需定义 interaction_kind
+    """
+    interaction_kind = None
+
+    def get_page_ids(self, obj):
+        # 作为 many=True 的子序列化器时, 父序列化器的 instance 就是当前这一页对象(列表或已求值的查询集)
+        page = self.parent.instance if isinstance(self.parent, serializers.ListSerializer) else None
+        if page is None or isinstance(page, BaseManager):
+            return [obj.pk]
+        return [item.pk for item in page]
+
+    def has_interaction(self, obj, action):
+        request = self.context.get('request')
+        if request is None:
+            return False
+        interactions = get_interactions(request)
+        if obj.pk not in interactions.loaded[self.interaction_kind]:
+            interactions.load(self.interaction_kind, [obj.pk, *self.get_page_ids(obj)])
+        return interactions.has(self.interaction_kind, action, obj.pk)
+
+    def get_has_liked(self, obj):
+        return self.has_interaction(obj, LIKE)
+
+    def get_has_collected(self, obj):
+        return self.has_interaction(obj, COLLECT)
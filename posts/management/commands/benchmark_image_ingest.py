@@ -0,0 +1,114 @@
+import multiprocessing
+import os
+import resource
+import tempfile
+import time
+from io import BytesIO
+
+import django
+
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from django.core.management.base import BaseCommand
+from PIL import Image
+
+from API import images
+
+# 测试图片: (名称, 格式, 宽, 高)
+SAMPLES = (
+    ('photo-24mp.jpg', 'JPEG', 6000, 4000),
+    ('photo-12mp.jpg', 'JPEG', 4000, 3000),
+    ('screenshot-8mp.png', 'PNG', 3840, 2160),
+)
+
+
+def make_sample(path, fmt, width, height):
+    # 渐变叠加放大的噪声, 接近照片的压缩率
+    noise = Image.effect_noise((width // 16, height // 16), 64).resize((width, height))
+    gradient = Image.linear_gradient('L').resize((width, height))
+    image = Image.merge('RGB', (noise, gradient, gradient.transpose(Image.FLIP_LEFT_RIGHT)))
+    image.save(path, fmt, quality=90)
+
+
+def naive(path, workdir):
+    # 改动前的做法: 读入内存后按原尺寸解码, 再整体重新编码
+    with open(path, 'rb') as f:
+        image = Image.open(BytesIO(f.read()))
+        output = BytesIO()
+        image.save(output, format='JPEG', quality=70)
+
+
+def ingest(path, workdir):
+    from posts import covers
+
+    upload = TemporaryUploadedFile(os.path.basename(path), 'application/octet-stream', os.path.getsize(path), None)
+    # 与 Django 保存大文件上传时一样, 内容位于临时文件中
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(64 * 1024), b''):
+            upload.write(chunk)
+    upload.seek(0)
+    images.validate_image(upload)
+    images.render_variants(upload, covers.VARIANTS, 'variants', 'bench', storage=FileSystemStorage(workdir))
+    upload.close()
+
+
+MODES = {'naive': naive, 'ingest': ingest}
+
+
+def peak_rss():
+    """
+    :return: 进程的峰值 RSS(KB)
+    """
+    # ru_maxrss 会继承 fork 前父进程的峰值, Linux 上优先读取随 exec 重新计算的 VmHWM
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def measure(mode, path, workdir, queue):
+    # 在独立进程中运行, 峰值只包含本次处理
+    django.setup()
+    baseline = peak_rss()
+    started = time.monotonic()
+    MODES[mode](path, workdir)
+    elapsed = time.monotonic() - started
+    queue.put((baseline, peak_rss(), elapsed))
+
+
+class Command(BaseCommand):
+    help = 'Report the peak RSS of decoding and resizing uploaded images, before and after API.images'
+
+    def add_arguments(self, parser):
+        parser.add_argument('images', nargs='*', help='image files to measure (default: generated samples)')
+        parser.add_argument('--mode', choices=tuple(MODES), action='append', help='mode to measure, repeatable')
+
+    def handle(self, *args, **options):
+        modes = options['mode'] or list(MODES)
+        context = multiprocessing.get_context('spawn')
+        with tempfile.TemporaryDirectory() as workdir:
+            paths = options['images']
+            if not paths:
+                for name, fmt, width, height in SAMPLES:
+                    path = os.path.join(workdir, name)
+                    make_sample(path, fmt, width, height)
+                    paths.append(path)
+            self.stdout.write(f'{"image":<24}{"size":>12}{"mode":>8}{"peak RSS":>12}{"delta":>12}{"time":>8}')
+            for path in paths:
+                with Image.open(path) as image:
+                    size = f'{image.width}x{image.height}'
+                for mode in modes:
+                    queue = context.Queue()
+                    process = context.Process(target=measure, args=(mode, path, workdir, queue))
+                    process.start()
+                    process.join()
+                    if process.exitcode != 0:
+                        self.stderr.write(f'{os.path.basename(path)} {mode}: failed')
+                        continue
+                    baseline, peak, elapsed = queue.get()
+                    self.stdout.write(f'{os.path.basename(path):<24}{size:>12}{mode:>8}{peak / 1024:>10.1f}MB'
+                                      f'{(peak - baseline) / 1024:>10.1f}MB{elapsed:>7.2f}s')
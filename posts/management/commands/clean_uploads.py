@@ -0,0 +1,45 @@
+import os
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from posts import uploads
+from posts.models import PostAttachment
+
+
+class Command(BaseCommand):
+    help = 'Delete chunked attachment uploads that have not received a chunk for a while'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=int, default=24,
+                            help='delete uploads with no activity for this many hours')
+        parser.add_argument('--dry-run', action='store_true', help='only report what would be deleted')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(hours=options['hours'])
+        stale = PostAttachment.objects.filter(status=PostAttachment.UPLOADING, last_modified__lt=cutoff)
+        deleted = 0
+        for attachment in stale.iterator():
+            deleted += 1
+            self.stdout.write(f'{attachment.pk}: {attachment.filename} ({attachment.received}/{attachment.size} bytes)')
+            if not options['dry_run']:
+                # post_delete 信号删除 .part 文件
+                attachment.delete()
+
+        # 没有对应记录的 .part 文件, 例如数据库回滚后留下的
+        orphans = 0
+        if os.path.isdir(uploads.UPLOAD_DIR):
+            existing = {str(pk) for pk in PostAttachment.objects.filter(
+                status=PostAttachment.UPLOADING).values_list('pk', flat=True)}
+            for filename in os.listdir(uploads.UPLOAD_DIR):
+                stem, extension = os.path.splitext(filename)
+                path = os.path.join(uploads.UPLOAD_DIR, filename)
+                if extension != '.part' or stem in existing or os.path.getmtime(path) > cutoff.timestamp():
+                    continue
+                orphans += 1
+                if not options['dry_run']:
+                    os.remove(path)
+
+        suffix = ' (dry run)' if options['dry_run'] else ''
+        self.stdout.write(self.style.SUCCESS(f'{deleted} stale uploads and {orphans} orphan part files deleted{suffix}'))
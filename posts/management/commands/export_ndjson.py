@@ -0,0 +1,50 @@
+import gzip
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import export
+
+
+class Command(BaseCommand):
+    help = ('Export users (public profile fields only), posts, comments, likes, collects and notifications '
+            'as NDJSON; the output can be restored with import_jsonl')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default='-', help='output file, "-" for stdout')
+        parser.add_argument('--types', default=','.join(export.TYPES),
+                            help='comma separated types to export (default: all)')
+        parser.add_argument('--cursor', help='resume after the line "type:pk" of a previous export')
+        parser.add_argument('--chunk-size', type=int, default=export.CHUNK_SIZE, help='rows read per batch')
+        parser.add_argument('--gzip', action='store_true', help='gzip the output')
+
+    def handle(self, *args, **options):
+        types = [name for name in options['types'].split(',') if name]
+        unknown = set(types) - set(export.TYPES)
+        if unknown:
+            raise CommandError(f'unknown types: {", ".join(sorted(unknown))}')
+        # iter_lines 是生成器, 游标要在打开输出文件之前校验
+        try:
+            export.parse_cursor(options['cursor'])
+        except ValueError as e:
+            raise CommandError(str(e))
+        lines = export.iter_lines(types, cursor=options['cursor'], chunk_size=options['chunk_size'])
+
+        if options['output'] == '-':
+            stream = sys.stdout.buffer
+            if options['gzip']:
+                stream = gzip.GzipFile(fileobj=stream, mode='wb')
+        elif options['gzip']:
+            stream = gzip.open(options['output'], 'wb')
+        else:
+            stream = open(options['output'], 'wb')
+
+        total = 0
+        try:
+            for line in lines:
+                stream.write(line.encode('utf-8'))
+                total += 1
+        finally:
+            if stream is not sys.stdout.buffer:
+                stream.close()
+        self.stderr.write(self.style.SUCCESS(f'{total} rows exported'))
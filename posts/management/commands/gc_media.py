@@ -0,0 +1,77 @@
+import os
+import time
+from datetime import timedelta
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from API import images, storage
+from posts.models import MediaFile, Post, PostAttachment
+from users.models import User
+
+
+def iter_references():
+    """
+    逐个生成封面、头像及其缩略图和帖子附件引用的文件名, 每个引用生成一次
+    """
+    has_cover = Post.objects.exclude(coverImg='').exclude(coverImg__isnull=True)
+    yield from has_cover.values_list('coverImg', flat=True).iterator()
+    for variants in Post.objects.exclude(cover_variants={}).values_list('cover_variants', flat=True).iterator():
+        yield from images.variant_names(variants)
+    has_file = PostAttachment.objects.exclude(file='').exclude(file__isnull=True)
+    yield from has_file.values_list('file', flat=True).iterator()
+    has_avatar = User.objects.exclude(avatar='').exclude(avatar__isnull=True)
+    yield from has_avatar.values_list('avatar', flat=True).iterator()
+    for variants in User.objects.exclude(avatar_variants={}).values_list('avatar_variants', flat=True).iterator():
+        yield from images.variant_names(variants)
+
+
+class Command(BaseCommand):
+    help = 'Recount references to content-addressed media files and delete unreferenced files'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--grace', type=int, default=3600,
+                            help='keep unreferenced files younger than this many seconds (uploads in progress)')
+        parser.add_argument('--dry-run', action='store_true', help='only report what would change')
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        counts = {}
+        for name in iter_references():
+            if storage.is_hashed(name):
+                counts[name] = counts.get(name, 0) + 1
+
+        fixed = 0
+        existing = dict(MediaFile.objects.values_list('name', 'refcount'))
+        for name, refcount in counts.items():
+            if existing.get(name) == refcount:
+                continue
+            fixed += 1
+            self.stdout.write(f'{name}: refcount {existing.get(name, 0)} -> {refcount}')
+            if not dry_run:
+                size = default_storage.size(name) if default_storage.exists(name) else 0
+                MediaFile.objects.update_or_create(name=name, defaults={'refcount': refcount, 'size': size})
+
+        # 没有引用的文件和计数: 超过宽限期才删除, 避免删除刚保存、尚未写入模型的文件
+        grace = options['grace']
+        deleted = 0
+        root = default_storage.path(storage.PREFIX)
+        for directory, _, filenames in os.walk(root):
+            for filename in filenames:
+                path = os.path.join(directory, filename)
+                name = os.path.relpath(path, default_storage.location).replace(os.sep, '/')
+                if name in counts or os.path.getmtime(path) > time.time() - grace:
+                    continue
+                deleted += 1
+                self.stdout.write(f'{name}: unreferenced')
+                if not dry_run:
+                    MediaFile.objects.filter(name=name).delete()
+                    os.remove(path)
+        stale = MediaFile.objects.exclude(name__in=list(counts)).filter(
+            created__lt=timezone.now() - timedelta(seconds=grace))
+        if not dry_run:
+            stale.delete()
+
+        suffix = ' (dry run)' if dry_run else ''
+        self.stdout.write(self.style.SUCCESS(f'{fixed} refcounts fixed, {deleted} orphan files deleted{suffix}'))
@@ -0,0 +1,37 @@
+import gzip
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import bulkimport
+
+
+class Command(BaseCommand):
+    help = 'Bulk import users, posts, tags, comments, likes and collects from a JSONL file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='JSONL file, gzip compressed if it ends with .gz')
+        parser.add_argument('--batch-size', type=int, default=bulkimport.BATCH_SIZE, help='rows written per batch')
+        parser.add_argument('--no-rebuild', action='store_true',
+                            help='skip rebuilding comment trees, counters and indexes (run once after the last file)')
+
+    def handle(self, *args, **options):
+        opener = gzip.open if options['path'].endswith('.gz') else open
+        importer = bulkimport.Importer(batch_size=options['batch_size'], stdout=self.stdout)
+        with opener(options['path'], 'rt', encoding='utf-8') as f:
+            for number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    importer.add(json.loads(line))
+                except (ValueError, KeyError) as e:
+                    raise CommandError(f'line {number}: {e}')
+        try:
+            importer.finish(rebuild=not options['no_rebuild'])
+        except ValueError as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(
+            f'{importer.total} rows imported ({importer.rate():.0f} rows/s): '
+            + ', '.join(f'{name} {count}' for name, count in importer.counts.items() if count)))
+        if importer.skipped:
+            self.stdout.write(f'{importer.skipped} notification rows skipped')
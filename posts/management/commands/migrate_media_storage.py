@@ -0,0 +1,39 @@
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from API import storage
+from posts import covers
+from posts.models import Post
+from users import avatars
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = 'Move covers and avatars saved under their upload names into the content-addressed storage'
+
+    def migrate(self, model, field, process):
+        migrated = missing = 0
+        queryset = model.objects.exclude(**{field: ''}).exclude(**{f'{field}__isnull': True}).exclude(
+            **{f'{field}__startswith': storage.PREFIX + '/'})
+        for pk, name in queryset.values_list('pk', field).iterator():
+            if not default_storage.exists(name):
+                missing += 1
+                self.stderr.write(f'{model.__name__} {pk}: {name} not found')
+                continue
+            with default_storage.open(name) as file:
+                new_name = default_storage.save(name, file)
+            if model.objects.filter(pk=pk, **{field: name}).update(**{field: new_name}):
+                default_storage.delete(name)
+            else:
+                # 迁移期间被更换, 释放刚保存的引用
+                default_storage.delete(new_name)
+                continue
+            # 原图的文件名变化后缩略图过期, 重新生成到新的存储中并删除旧的缩略图
+            process(pk)
+            migrated += 1
+        return migrated, missing
+
+    def handle(self, *args, **options):
+        for model, field, process in ((Post, 'coverImg', covers.process), (User, 'avatar', avatars.process)):
+            migrated, missing = self.migrate(model, field, process)
+            self.stdout.write(self.style.SUCCESS(f'{model.__name__}.{field}: {migrated} migrated, {missing} missing'))
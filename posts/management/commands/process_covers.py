@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from posts import covers
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Generate the resized cover variants of posts whose variants are missing or out of date'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--post', type=int, action='append', help='post ID to process, repeatable (default: all)')
+        parser.add_argument('--force', action='store_true', help='regenerate all variants, e.g. after changing sizes')
+
+    def handle(self, *args, **options):
+        queryset = Post.objects.exclude(coverImg='').exclude(coverImg__isnull=True).order_by('postID')
+        if options['post']:
+            queryset = queryset.filter(postID__in=options['post'])
+        processed = failed = 0
+        for post_id in queryset.values_list('postID', flat=True).iterator():
+            try:
+                processed += covers.process(post_id, force=options['force'])
+            except Exception as e:
+                failed += 1
+                self.stderr.write(f'post {post_id}: {e}')
+        self.stdout.write(self.style.SUCCESS(f'{processed} covers processed, {failed} failed'))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from posts import timeline
+from posts.models import Plate
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the cached per-plate timelines of recent posts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--plate', type=int, action='append', help='plate ID to rebuild, repeatable (default: all)')
+
+    def handle(self, *args, **options):
+        if not timeline.enabled():
+            self.stderr.write('The default cache is not shared between processes, plate timelines are disabled')
+            return
+        plate_ids = options['plate'] or list(Plate.objects.values_list('plateID', flat=True))
+        for plate_id in plate_ids:
+            entries = timeline.build(plate_id)['entries']
+            self.stdout.write(f'plate {plate_id}: {len(entries)} posts')
+        self.stdout.write(self.style.SUCCESS(f'{len(plate_ids)} plate timelines rebuilt'))
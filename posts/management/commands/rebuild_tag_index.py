@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from posts import tagindex
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the tag -> post index and the per-plate tag counts from the taggit tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='number of posts indexed per batch')
+
+    def handle(self, *args, **options):
+        total = tagindex.rebuild_index(batch_size=options['batch_size'], stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS(f'tag index rebuilt for {total} posts'))
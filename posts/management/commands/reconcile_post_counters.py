@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+
+from comments.models import Comment
+from posts.models import Post, LikeUserPost, CollectUserPost
+
+COUNTERS = (
+    ('like_count', LikeUserPost),
+    ('collect_count', CollectUserPost),
+    ('comment_count', Comment),
+)
+
+
+class Command(BaseCommand):
+    help = 'Recount the like/collect/comment counters of posts and repair the ones that drifted'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='number of posts checked per batch')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        fields = [field for field, _ in COUNTERS]
+        queryset = Post.objects.order_by('postID').only('postID', *fields)
+        last_id = 0
+        checked = 0
+        repaired = 0
+        while True:
+            posts = list(queryset.filter(postID__gt=last_id)[:batch_size])
+            if not posts:
+                break
+            post_ids = [post.postID for post in posts]
+            # 每种计数一次分组查询
+            actual = {
+                field: dict(model.objects.filter(post_id__in=post_ids).order_by().values('post')
+                            .annotate(count=Count('*')).values_list('post', 'count'))
+                for field, model in COUNTERS
+            }
+            drifted = []
+            for post in posts:
+                changed = False
+                for field in fields:
+                    count = actual[field].get(post.postID, 0)
+                    if getattr(post, field) != count:
+                        setattr(post, field, count)
+                        changed = True
+                if changed:
+                    drifted.append(post)
+            Post.objects.bulk_update(drifted, fields)
+            checked += len(posts)
+            repaired += len(drifted)
+            last_id = post_ids[-1]
+        self.stdout.write(self.style.SUCCESS(f'{checked} posts checked, {repaired} repaired'))
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Pre-render the Markdown of posts whose rendered HTML is missing or out of date'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=200, help='number of posts rendered per batch')
+        parser.add_argument('--force', action='store_true', help='re-render all posts, e.g. after changing extensions')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        queryset = Post.objects.order_by('postID').only('postID', 'content', 'content_hash', 'excerpt')
+        last_id = 0
+        rendered = 0
+        while True:
+            posts = list(queryset.filter(postID__gt=last_id)[:batch_size])
+            if not posts:
+                break
+            changed = [post for post in posts if post.render_md(force=options['force'])]
+            # bulk_update 不会触发 auto_now, 不会改变 last_modified
+            Post.objects.bulk_update(changed, ['content_html', 'content_toc', 'content_hash', 'excerpt'])
+            rendered += len(changed)
+            last_id = posts[-1].postID
+        self.stdout.write(self.style.SUCCESS(f'{rendered} posts rendered'))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from posts import hot
+
+
+class Command(BaseCommand):
+    help = 'Recompute the time-decayed hot score of recent posts, meant to be run periodically (e.g. by cron)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='number of posts updated per batch')
+
+    def handle(self, *args, **options):
+        total = hot.update_hot_scores(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'hot score of {total} posts updated'))
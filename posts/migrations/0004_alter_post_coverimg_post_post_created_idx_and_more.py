@@ -0,0 +1,26 @@
+# Generated by Django 4.2.6 on 2026-10-17 10:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0003_remove_plate_moderators_post_views_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='post',
+            name='coverImg',
+            field=models.ImageField(blank=True, null=True, upload_to='covers', verbose_name='封面'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['created', 'postID'], name='post_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['views', 'postID'], name='post_views_idx'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.6 on 2026-10-17 10:05
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0004_alter_post_coverimg_post_post_created_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostSearchDocument',
+            fields=[
+                ('post', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='searchDocument', serialize=False, to='posts.post', verbose_name='帖子')),
+                ('length', models.PositiveIntegerField(default=0, verbose_name='文档长度')),
+                ('indexed', models.DateTimeField(auto_now=True, verbose_name='索引时间')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='PostSearchTerm',
+            fields=[
+                ('termID', models.AutoField(primary_key=True, serialize=False, verbose_name='倒排索引ID')),
+                ('term', models.CharField(max_length=32, verbose_name='词项')),
+                ('tf', models.PositiveIntegerField(default=0, verbose_name='词频')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='searchTerms', to='posts.post', verbose_name='帖子')),
+            ],
+            options={
+                'unique_together': {('term', 'post')},
+            },
+        ),
+    ]
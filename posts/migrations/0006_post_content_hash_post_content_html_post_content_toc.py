@@ -0,0 +1,28 @@
+# Generated by Django 4.2.6 on 2026-10-17 10:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0005_postsearchdocument_postsearchterm'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='content_hash',
+            field=models.CharField(blank=True, default='', max_length=64, verbose_name='内容哈希'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='content_html',
+            field=models.TextField(blank=True, default='', verbose_name='渲染后的内容'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='content_toc',
+            field=models.TextField(blank=True, default='', verbose_name='渲染后的目录'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 4.2.6 on 2026-10-17 10:08
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_counters(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    counters = (
+        ('like_count', apps.get_model('posts', 'LikeUserPost')),
+        ('collect_count', apps.get_model('posts', 'CollectUserPost')),
+        ('comment_count', apps.get_model('comments', 'Comment')),
+    )
+    for field, model in counters:
+        count = model.objects.filter(post=OuterRef('pk')).order_by().values('post').annotate(
+            count=Count('*')).values('count')
+        Post.objects.update(**{field: Coalesce(Subquery(count), 0)})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0007_remove_post_post_views_idx_post_hot_score_and_more'),
+        ('comments', '0003_alter_comment_parent_likeusercomment_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='collect_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='收藏数'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='评论数'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='like_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='点赞数'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
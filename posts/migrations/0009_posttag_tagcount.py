@@ -0,0 +1,67 @@
+# Generated by Django 4.2.6 on 2026-10-17 10:15
+
+from django.db import migrations, models
+from django.db.models import Count
+import django.db.models.deletion
+
+
+def fill_tag_index(apps, schema_editor):
+    ContentType = apps.get_model('contenttypes', 'ContentType')
+    TaggedItem = apps.get_model('taggit', 'TaggedItem')
+    Post = apps.get_model('posts', 'Post')
+    PostTag = apps.get_model('posts', 'PostTag')
+    TagCount = apps.get_model('posts', 'TagCount')
+    content_type = ContentType.objects.filter(app_label='posts', model='post').first()
+    if content_type is None:
+        return
+    plates = dict(Post.objects.values_list('postID', 'plate_id'))
+    PostTag.objects.bulk_create(
+        [PostTag(tag_id=tag_id, post_id=post_id, plate_id=plates[post_id]) for tag_id, post_id in
+         TaggedItem.objects.filter(content_type=content_type).values_list('tag_id', 'object_id')
+         if post_id in plates],
+        batch_size=1000,
+    )
+    TagCount.objects.bulk_create(
+        [TagCount(tag_id=tag_id, plate_id=plate_id, count=count) for tag_id, plate_id, count in
+         PostTag.objects.order_by().values('tag', 'plate').annotate(count=Count('pk'))
+         .values_list('tag', 'plate', 'count')],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('taggit', '0005_auto_20220424_2025'),
+        ('posts', '0008_post_collect_count_post_comment_count_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TagCount',
+            fields=[
+                ('tagCountID', models.AutoField(primary_key=True, serialize=False, verbose_name='标签计数ID')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='帖子数')),
+                ('plate', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tagCounts', to='posts.plate', verbose_name='板块')),
+                ('tag', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='postCounts', to='taggit.tag', verbose_name='标签')),
+            ],
+            options={
+                'unique_together': {('tag', 'plate')},
+            },
+        ),
+        migrations.CreateModel(
+            name='PostTag',
+            fields=[
+                ('postTagID', models.AutoField(primary_key=True, serialize=False, verbose_name='标签索引ID')),
+                ('plate', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tagIndex', to='posts.plate', verbose_name='板块')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tagIndex', to='posts.post', verbose_name='帖子')),
+                ('tag', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='postIndex', to='taggit.tag', verbose_name='标签')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['tag', 'plate', 'post'], name='post_tag_plate_idx')],
+                'unique_together': {('tag', 'post')},
+            },
+        ),
+        migrations.RunPython(fill_tag_index, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.6 on 2026-10-17 10:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0009_posttag_tagcount'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['plate', 'created', 'postID'], name='post_plate_created_idx'),
+        ),
+    ]
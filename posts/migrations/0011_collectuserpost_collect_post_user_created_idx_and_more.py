@@ -0,0 +1,21 @@
+# Generated by Django 4.2.6 on 2026-10-17 10:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0010_post_plate_created_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='collectuserpost',
+            index=models.Index(fields=['user', 'created', 'post'], name='collect_post_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='likeuserpost',
+            index=models.Index(fields=['user', 'created', 'post'], name='like_post_user_created_idx'),
+        ),
+    ]
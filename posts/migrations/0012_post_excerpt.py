@@ -0,0 +1,41 @@
+# Generated by Django 4.2.6 on 2026-10-17 10:22
+
+import re
+from html import unescape
+
+from django.db import migrations, models
+from django.utils.html import strip_tags
+
+CODE_BLOCK_RE = re.compile(r'<pre\b.*?</pre>', re.S)
+
+
+def fill_excerpts(apps, schema_editor):
+    # 从已保存的渲染结果生成摘要, 尚未渲染的帖子由 render_post_markdown 补齐
+    Post = apps.get_model('posts', 'Post')
+    queryset = Post.objects.exclude(content_html='').order_by('postID').only('postID', 'content_html')
+    last_id = 0
+    while True:
+        posts = list(queryset.filter(postID__gt=last_id)[:500])
+        if not posts:
+            break
+        for post in posts:
+            text = unescape(strip_tags(CODE_BLOCK_RE.sub(' ', post.content_html)))
+            post.excerpt = ' '.join(text.split())[:100]
+        Post.objects.bulk_update(posts, ['excerpt'])
+        last_id = posts[-1].postID
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0011_collectuserpost_collect_post_user_created_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='excerpt',
+            field=models.CharField(blank=True, default='', max_length=100, verbose_name='摘要'),
+        ),
+        migrations.RunPython(fill_excerpts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.6 on 2026-10-17 10:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0012_post_excerpt'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='cover_variants',
+            field=models.JSONField(blank=True, default=dict, verbose_name='封面缩略图'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.6 on 2026-10-17 10:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0013_post_cover_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MediaFile',
+            fields=[
+                ('fileID', models.AutoField(primary_key=True, serialize=False, verbose_name='文件ID')),
+                ('name', models.CharField(max_length=100, unique=True, verbose_name='文件名')),
+                ('size', models.PositiveBigIntegerField(default=0, verbose_name='文件大小')),
+                ('refcount', models.PositiveIntegerField(default=0, verbose_name='引用数')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='创建时间')),
+            ],
+        ),
+    ]
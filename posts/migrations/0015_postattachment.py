@@ -0,0 +1,37 @@
+# Generated by Django 4.2.6 on 2026-10-17 10:38
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0014_mediafile'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostAttachment',
+            fields=[
+                ('attachmentID', models.AutoField(primary_key=True, serialize=False, verbose_name='附件ID')),
+                ('filename', models.CharField(max_length=255, verbose_name='文件名')),
+                ('size', models.PositiveBigIntegerField(verbose_name='文件大小')),
+                ('received', models.PositiveBigIntegerField(default=0, verbose_name='已接收字节数')),
+                ('content_type', models.CharField(blank=True, default='', max_length=100, verbose_name='文件类型')),
+                ('sha256', models.CharField(blank=True, default='', max_length=64, verbose_name='SHA-256')),
+                ('status', models.CharField(choices=[('uploading', '上传中'), ('complete', '已完成')], default='uploading', max_length=10, verbose_name='状态')),
+                ('file', models.FileField(blank=True, max_length=255, null=True, upload_to='attachments', verbose_name='文件')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='创建时间')),
+                ('last_modified', models.DateTimeField(auto_now=True, verbose_name='最后修改时间')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attachments', to='posts.post', verbose_name='帖子')),
+                ('uploader', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attachments', to=settings.AUTH_USER_MODEL, verbose_name='上传者')),
+            ],
+            options={
+                'ordering': ['attachmentID'],
+                'indexes': [models.Index(fields=['post', 'status'], name='attachment_post_status_idx'), models.Index(fields=['status', 'last_modified'], name='attachment_status_time_idx')],
+            },
+        ),
+    ]
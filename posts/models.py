@@ -1,10 +1,77 @@
+import hashlib
+import re
+from html import unescape
+
 from django.db import models
+from django.utils import timezone
+from django.utils.html import strip_tags
 from markdown import Markdown
 from taggit.managers import TaggableManager
+from taggit.models import Tag
 
+from posts import viewcounter
 from users.models import User
 
 
+def render_markdown(content):
+    """
+    将 Markdown 渲染为 HTML
+    :return: (html, toc)
+    """
+    md = Markdown(
+        extensions=[
+            'markdown.extensions.extra',
+            'markdown.extensions.codehilite',
+            'markdown.extensions.toc',
+        ]
+    )
+    md_content = md.convert(content)
+    # toc 是渲染后的目录
+    return md_content, md.toc
+
+
+def content_hash(content):
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+
+EXCERPT_LENGTH = 100
+CODE_BLOCK_RE = re.compile(r'<pre\b.*?</pre>', re.S)
+
+
+def plain_text(html):
+    """
+    从渲染后的 HTML 提取纯文本, 去掉代码块和 Markdown 语法
+    """
+    text = unescape(strip_tags(CODE_BLOCK_RE.sub(' ', html)))
+    return ' '.join(text.split())
+
+
+def make_excerpt(html, length=EXCERPT_LENGTH):
+    """
+    从渲染后的 HTML 提取纯文本摘要
+    """
+    return plain_text(html)[:length]
+
+
+class PostQuerySet(models.QuerySet):
+    """
+    QuerySet for Post
+    """
+
+    def feed(self):
+        """
+        帖子列表使用的查询集: 作者、板块通过 join 取出, 标签批量预取, 计数读取冗余字段,
+        当前用户的点赞/收藏状态由 posts.interactions 按页批量读取, 因此无论分页大小, 一页的查询次数都是常数
+        """
+        return self.select_related('author', 'plate').prefetch_related('tags')
+
+    def cards(self):
+        """
+        帖子卡片列表使用的查询集: 在 feed() 的基础上不读取正文和渲染结果, 卡片只显示 excerpt
+        """
+        return self.feed().defer('content', 'content_html', 'content_toc', 'content_hash')
+
+
 class Post(models.Model):
     """
     Post model
@@ -14,12 +81,27 @@ class Post(models.Model):
     content = models.TextField(verbose_name='内容')
     author = models.ForeignKey(User, on_delete=models.CASCADE, related_name="posts", verbose_name='作者')
     coverImg = models.ImageField(upload_to='covers', null=True, blank=True, verbose_name='封面')
+    # 后台生成的封面缩略图, 见 posts.covers
+    cover_variants = models.JSONField(default=dict, blank=True, verbose_name='封面缩略图')
     plate = models.ForeignKey('Plate', on_delete=models.CASCADE, related_name="posts", verbose_name='板块')
     created = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')
     last_modified = models.DateTimeField(auto_now=True, verbose_name='最后修改时间')
     is_essence = models.BooleanField(default=False, verbose_name='是否加精')
     tags = TaggableManager(blank=True, verbose_name='标签')
     views = models.PositiveIntegerField(default=0, verbose_name='浏览量')
+    # 预渲染的 Markdown, 只在 content 变化(content_hash 不一致)时重新渲染
+    content_html = models.TextField(blank=True, default='', verbose_name='渲染后的内容')
+    content_toc = models.TextField(blank=True, default='', verbose_name='渲染后的目录')
+    content_hash = models.CharField(max_length=64, blank=True, default='', verbose_name='内容哈希')
+    # 去掉 Markdown 语法后的纯文本摘要, 随渲染结果一起更新, 用于列表卡片
+    excerpt = models.CharField(max_length=EXCERPT_LENGTH, blank=True, default='', verbose_name='摘要')
+    hot_score = models.FloatField(default=0, verbose_name='热度')
+    # 冗余计数, 在点赞、收藏、评论增删时用 F() 原子更新
+    like_count = models.PositiveIntegerField(default=0, verbose_name='点赞数')
+    collect_count = models.PositiveIntegerField(default=0, verbose_name='收藏数')
+    comment_count = models.PositiveIntegerField(default=0, verbose_name='评论数')
+
+    objects = PostQuerySet.as_manager()
 
     # 以下字段已在外键中定义
     # comments = models.ManyToManyField('comments.Comment', through='comments.models.Comment', verbose_name='评论')
@@ -31,22 +113,59 @@ class Post(models.Model):
 
     class Meta:
         ordering = ('-created',)
+        # 游标分页使用的排序索引, 热门列表分为全站和按板块两种
+        indexes = [
+            models.Index(fields=['created', 'postID'], name='post_created_idx'),
+            models.Index(fields=['plate', 'created', 'postID'], name='post_plate_created_idx'),
+            models.Index(fields=['hot_score', 'postID'], name='post_hot_idx'),
+            models.Index(fields=['plate', 'hot_score', 'postID'], name='post_plate_hot_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # 记录读取时的板块, 保存时用于判断帖子是否被移动到其他板块
+        if 'plate_id' in field_names:
+            instance._loaded_plate_id = instance.plate_id
+        return instance
+
+    def render_md(self, force=False):
+        """
+        content 有变化时重新渲染 Markdown
+        :return: 是否重新渲染
+        """
+        new_hash = content_hash(self.content)
+        if not force and new_hash == self.content_hash:
+            return False
+        self.content_html, self.content_toc = render_markdown(self.content)
+        self.content_hash = new_hash
+        self.excerpt = make_excerpt(self.content_html)
+        return True
 
     def get_md(self):
-        md = Markdown(
-            extensions=[
-                'markdown.extensions.extra',
-                'markdown.extensions.codehilite',
-                'markdown.extensions.toc',
-            ]
-        )
-        md_content = md.convert(self.content)
-        # toc 是渲染后的目录
-        return md_content, md.toc
+        self.render_md()
+        return self.content_html, self.content_toc
+
+    def save(self, *args, **kwargs):
+        if self._state.adding and not self.hot_score:
+            # 新帖子发布时就给出初始热度, 否则在 update_hot_scores 下次执行前会排在所有帖子之后
+            from posts import hot
+            now = timezone.now()
+            self.hot_score = hot.hot_score(self.views, self.like_count, self.collect_count, self.comment_count,
+                                           self.created or now, now)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'content' in update_fields:
+            if self.render_md() and update_fields is not None:
+                kwargs['update_fields'] = set(update_fields) | {'content_html', 'content_toc', 'content_hash',
+                                                                 'excerpt'}
+        super().save(*args, **kwargs)
+        # post_save 的接收者都已经处理完板块变化
+        self._loaded_plate_id = self.plate_id
 
     def increase_views(self):
+        # 浏览量先记录在写缓冲中, 由后台线程批量写回数据库, 读帖子时不产生写操作
         self.views += 1
-        self.save(update_fields=['views'])
+        viewcounter.record_view(self.pk)
 
     def __str__(self):
         return self.title
@@ -102,6 +221,10 @@ class LikeUserPost(models.Model):
     class Meta:
         unique_together = ('post', 'user')
         ordering = ('-created',)
+        # 用户的点赞/收藏列表按时间倒序游标分页, 索引包含 post 以覆盖查询
+        indexes = [
+            models.Index(fields=['user', 'created', 'post'], name='like_post_user_created_idx'),
+        ]
 
     def __str__(self):
         return self.post.title + ' ' + self.user.username
@@ -119,6 +242,127 @@ class CollectUserPost(models.Model):
     class Meta:
         unique_together = ('post', 'user')
         ordering = ('-created',)
+        # 用户的点赞/收藏列表按时间倒序游标分页, 索引包含 post 以覆盖查询
+        indexes = [
+            models.Index(fields=['user', 'created', 'post'], name='collect_post_user_created_idx'),
+        ]
 
     def __str__(self):
         return self.post.title + ' ' + self.user.username
+
+
+class PostSearchDocument(models.Model):
+    """
+    PostSearchDocument model
+    全文检索中每篇帖子的统计信息, 用于 BM25 的文档长度归一化
+    """
+    post = models.OneToOneField(Post, on_delete=models.CASCADE, primary_key=True, related_name="searchDocument",
+                                verbose_name='帖子')
+    length = models.PositiveIntegerField(default=0, verbose_name='文档长度')
+    indexed = models.DateTimeField(auto_now=True, verbose_name='索引时间')
+
+    def __str__(self):
+        return self.post.title
+
+
+class PostSearchTerm(models.Model):
+    """
+    PostSearchTerm model
+    全文检索的倒排索引: 词项 -> 帖子, tf 为标题、标签、内容加权后的词频
+    """
+    termID = models.AutoField(primary_key=True, verbose_name='倒排索引ID')
+    term = models.CharField(max_length=32, verbose_name='词项')
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name="searchTerms", verbose_name='帖子')
+    tf = models.PositiveIntegerField(default=0, verbose_name='词频')
+
+    class Meta:
+        unique_together = ('term', 'post')
+
+    def __str__(self):
+        return self.term + ' ' + str(self.post_id)
+
+
+class PostTag(models.Model):
+    """
+    PostTag model
+    标签索引: 标签 -> 帖子的倒排表, 冗余帖子所在的板块, 由 posts.tagindex 维护
+    """
+    postTagID = models.AutoField(primary_key=True, verbose_name='标签索引ID')
+    tag = models.ForeignKey(Tag, on_delete=models.CASCADE, related_name="postIndex", verbose_name='标签')
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name="tagIndex", verbose_name='帖子')
+    plate = models.ForeignKey(Plate, on_delete=models.CASCADE, related_name="tagIndex", verbose_name='板块')
+
+    class Meta:
+        unique_together = ('tag', 'post')
+        indexes = [
+            models.Index(fields=['tag', 'plate', 'post'], name='post_tag_plate_idx'),
+        ]
+
+    def __str__(self):
+        return self.tag.name + ' ' + str(self.post_id)
+
+
+class TagCount(models.Model):
+    """
+    TagCount model
+    每个板块中各标签的帖子数, 全站的帖子数为各板块之和
+    """
+    tagCountID = models.AutoField(primary_key=True, verbose_name='标签计数ID')
+    tag = models.ForeignKey(Tag, on_delete=models.CASCADE, related_name="postCounts", verbose_name='标签')
+    plate = models.ForeignKey(Plate, on_delete=models.CASCADE, related_name="tagCounts", verbose_name='板块')
+    count = models.PositiveIntegerField(default=0, verbose_name='帖子数')
+
+    class Meta:
+        unique_together = ('tag', 'plate')
+
+    def __str__(self):
+        return self.tag.name + ' ' + str(self.count)
+
+
+class MediaFile(models.Model):
+    """
+    MediaFile model
+    按内容寻址保存的上传文件(见 API.storage)的引用计数, 引用数降为 0 时删除文件
+    """
+    fileID = models.AutoField(primary_key=True, verbose_name='文件ID')
+    name = models.CharField(max_length=100, unique=True, verbose_name='文件名')
+    size = models.PositiveBigIntegerField(default=0, verbose_name='文件大小')
+    refcount = models.PositiveIntegerField(default=0, verbose_name='引用数')
+    created = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')
+
+    def __str__(self):
+        return self.name + ' ' + str(self.refcount)
+
+
+class PostAttachment(models.Model):
+    """
+    PostAttachment model
+    帖子附件, 通过分块上传(见 posts.uploads)写入, 上传完成前 file 为空
+    """
+    UPLOADING = 'uploading'
+    COMPLETE = 'complete'
+    STATUS_CHOICES = ((UPLOADING, '上传中'), (COMPLETE, '已完成'))
+
+    attachmentID = models.AutoField(primary_key=True, verbose_name='附件ID')
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name="attachments", verbose_name='帖子')
+    uploader = models.ForeignKey(User, on_delete=models.CASCADE, related_name="attachments", verbose_name='上传者')
+    filename = models.CharField(max_length=255, verbose_name='文件名')
+    size = models.PositiveBigIntegerField(verbose_name='文件大小')
+    received = models.PositiveBigIntegerField(default=0, verbose_name='已接收字节数')
+    content_type = models.CharField(max_length=100, blank=True, default='', verbose_name='文件类型')
+    # 初始化时为客户端声明的值(可以为空), 完成后为实际内容的 SHA-256
+    sha256 = models.CharField(max_length=64, blank=True, default='', verbose_name='SHA-256')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=UPLOADING, verbose_name='状态')
+    file = models.FileField(upload_to='attachments', max_length=255, null=True, blank=True, verbose_name='文件')
+    created = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')
+    last_modified = models.DateTimeField(auto_now=True, verbose_name='最后修改时间')
+
+    class Meta:
+        ordering = ['attachmentID']
+        indexes = [
+            models.Index(fields=['post', 'status'], name='attachment_post_status_idx'),
+            models.Index(fields=['status', 'last_modified'], name='attachment_status_time_idx'),
+        ]
+
+    def __str__(self):
+        return self.filename + ' ' + self.status
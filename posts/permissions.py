@@ -75,6 +75,22 @@ class PostCoverImgPermission(permissions.BasePermission):
         return False
 
 
+class PostAttachmentPermission(PostCoverImgPermission):
+    """
+    Global permission check for post attachments
+    """
+
+
+class AttachmentUploadPermission(permissions.BasePermission):
+    """
+    Global permission check for chunked attachment uploads
+    """
+    def has_permission(self, request, view):
+        if request.user.is_superuser:
+            return True
+
+        # 只有上传者可以查询、继续或取消自己的上传
+        return request.user == view.get_object().uploader
 
 
 class PlateActionPermission(permissions.BasePermission):
@@ -0,0 +1,134 @@
+"""
+公共列表接口的响应缓存
+
+缓存键 = 视图名 + 规范化的查询参数 + 相关版本号. 版本号分为全站帖子版本、各板块帖子版本和板块列表版本,
+帖子或板块变化时只需递增对应的版本号, 旧的缓存键不再被访问, 自然过期, 不需要扫描删除.
+缓存的内容与用户无关, 当前用户的点赞/收藏状态在取出缓存后再按页批量填入.
+版本号没有过期时间, 必须保存在所有 worker 共享的缓存(settings.CACHES)中, 否则一个进程递增版本号后其他进程仍使用旧版本.
+"""
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+
+from posts.interactions import get_interactions, LIKE, COLLECT
+
+TIMEOUT = getattr(settings, 'RESPONSE_CACHE_TIMEOUT', 60)
+
+POSTS_VERSION = 'posts'
+PLATES_VERSION = 'plates'
+
+# 已启用响应缓存的视图, 用于统计命中率
+cached_views = []
+
+
+def plate_version(plate_id):
+    return f'plate:{plate_id}'
+
+
+def version_key(name):
+    return f'response_cache:version:{name}'
+
+
+def get_versions(names):
+    keys = [version_key(name) for name in names]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, 1, timeout=None)
+            versions[key] = cache.get(key, 1)
+    return [versions[key] for key in keys]
+
+
+def bump_version(*names):
+    for name in names:
+        key = version_key(name)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, 2, timeout=None)
+
+
+def incr_stat(view_name, stat):
+    key = f'response_cache:{stat}:{view_name}'
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 1, timeout=None)
+
+
+def get_stats():
+    """
+    各视图的命中与未命中次数
+    """
+    keys = {}
+    for view_name in cached_views:
+        for stat in ('hit', 'miss'):
+            keys[f'response_cache:{stat}:{view_name}'] = (view_name, stat)
+    values = cache.get_many(list(keys))
+    stats = {}
+    for key, (view_name, stat) in keys.items():
+        stats.setdefault(view_name, {'hit': 0, 'miss': 0})[stat] = values.get(key, 0)
+    for item in stats.values():
+        total = item['hit'] + item['miss']
+        item['hit_rate'] = round(item['hit'] / total, 4) if total else None
+    return stats
+
+
+class ResponseCacheMixin:
+    """
+    为 GET 列表接口提供版本化的响应缓存, 视图通过 get_cached_payload(request) 读取响应数据,
+    未命中时由 get_response_payload(request) 生成, 默认为分页后的列表.
+    """
+    response_cache_timeout = TIMEOUT
+    # 设置为 'post' 或 'comment' 时, has_liked/has_collected 不进入缓存, 取出缓存后按当前用户填入
+    response_cache_interaction_kind = None
+    response_cache_pk_field = None
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cached_views.append(cls.__name__)
+
+    def get_response_cache_versions(self, request):
+        return [POSTS_VERSION]
+
+    def get_response_payload(self, request):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        if page is None:
+            raise Exception("page is None")
+        serializer = self.get_serializer(page, many=True, context={"request": request})
+        return self.paginator.get_paginated_data(serializer.data)
+
+    def get_response_cache_key(self, request):
+        params = sorted((key, request.query_params.getlist(key)) for key in request.query_params)
+        versions = get_versions(self.get_response_cache_versions(request))
+        digest = hashlib.md5(json.dumps([request.get_host(), params, versions]).encode()).hexdigest()
+        return f'response_cache:{self.__class__.__name__}:{digest}'
+
+    def get_cached_payload(self, request):
+        key = self.get_response_cache_key(request)
+        payload = cache.get(key)
+        if payload is None:
+            incr_stat(self.__class__.__name__, 'miss')
+            payload = self.get_response_payload(request)
+            if self.response_cache_interaction_kind:
+                for item in payload['results']:
+                    item.pop('has_liked', None)
+                    item.pop('has_collected', None)
+            cache.set(key, payload, timeout=self.response_cache_timeout)
+        else:
+            incr_stat(self.__class__.__name__, 'hit')
+        self.fill_user_fields(request, payload['results'])
+        return payload
+
+    def fill_user_fields(self, request, results):
+        if not self.response_cache_interaction_kind:
+            return
+        kind = self.response_cache_interaction_kind
+        interactions = get_interactions(request)
+        interactions.load(kind, [item[self.response_cache_pk_field] for item in results])
+        for item in results:
+            item['has_liked'] = interactions.has(kind, LIKE, item[self.response_cache_pk_field])
+            item['has_collected'] = interactions.has(kind, COLLECT, item[self.response_cache_pk_field])
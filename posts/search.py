@@ -0,0 +1,204 @@
+"""
+帖子全文检索
+
+倒排索引保存在 PostSearchTerm(词项 -> 帖子, 加权词频) 与 PostSearchDocument(文档长度) 中,
+查询时只读取查询词项的倒排记录, 用 BM25 打分排序, 不再对 title/content 做 LIKE '%x%' 扫描.
+中文没有空格分词, 按字符二元组(bigram)切分, 索引中同时保存单字, 单字查询也能命中较长的片段;
+英文和数字按单词切分并转为小写. 修改切分规则后需要执行 rebuild_search_index 重建索引.
+BM25 得分在数据库中按帖子汇总并排序, 只有前 limit 个结果读入 Python.
+"""
+import math
+import re
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Avg, Case, Count, F, FloatField, Sum, Value, When
+from django.db.models.functions import Cast
+from django.utils.html import escape
+
+from posts.models import Post, PostSearchDocument, PostSearchTerm
+
+# BM25 参数
+K1 = 1.2
+B = 0.75
+
+# 各字段的权重, 标题和标签命中比正文更重要
+TITLE_WEIGHT = 3
+TAG_WEIGHT = 2
+CONTENT_WEIGHT = 1
+
+# 单次查询最多返回的结果数
+MAX_RESULTS = 1000
+
+TERM_MAX_LENGTH = PostSearchTerm._meta.get_field('term').max_length
+
+CJK_PATTERN = r'[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+'
+TOKEN_RE = re.compile(r'(%s)|([0-9A-Za-z_]+)' % CJK_PATTERN)
+
+
+def tokenize(text, unigrams=False):
+    """
+    将文本切分为词项: 中文连续片段切为二元组(单字片段保留单字), 英文和数字转为小写单词
+    :param unigrams: 同时生成中文单字, 建立索引时使用; 查询时只有单字片段生成单字
+    """
+    tokens = []
+    for match in TOKEN_RE.finditer(text or ''):
+        cjk, word = match.groups()
+        if cjk:
+            if len(cjk) == 1:
+                tokens.append(cjk)
+            else:
+                tokens.extend(cjk[i:i + 2] for i in range(len(cjk) - 1))
+                if unigrams:
+                    tokens.extend(cjk)
+        else:
+            tokens.append(word.lower()[:TERM_MAX_LENGTH])
+    return tokens
+
+
+def analyze_post(post, tag_names=None):
+    """
+    计算帖子的加权词频和文档长度
+    :return: (Counter(term -> tf), length)
+    """
+    if tag_names is None:
+        tag_names = post.tags.names()
+    frequencies = Counter()
+    for token in tokenize(post.title, unigrams=True):
+        frequencies[token] += TITLE_WEIGHT
+    for token in tokenize(' '.join(tag_names), unigrams=True):
+        frequencies[token] += TAG_WEIGHT
+    for token in tokenize(post.content, unigrams=True):
+        frequencies[token] += CONTENT_WEIGHT
+    return frequencies, sum(frequencies.values())
+
+
+def index_post(post, tag_names=None):
+    """
+    重建单篇帖子的倒排记录
+    """
+    frequencies, length = analyze_post(post, tag_names)
+    with transaction.atomic():
+        PostSearchTerm.objects.filter(post=post).delete()
+        PostSearchTerm.objects.bulk_create(
+            [PostSearchTerm(term=term, post=post, tf=tf) for term, tf in frequencies.items()]
+        )
+        PostSearchDocument.objects.update_or_create(post=post, defaults={'length': length})
+
+
+def remove_post(post_id):
+    """
+    删除帖子的倒排记录, 帖子本身删除时会级联删除, 这里用于手动清理
+    """
+    with transaction.atomic():
+        PostSearchTerm.objects.filter(post_id=post_id).delete()
+        PostSearchDocument.objects.filter(post_id=post_id).delete()
+
+
+def rebuild_index(batch_size=500, stdout=None):
+    """
+    清空并重建全部帖子的索引
+    :return: 索引的帖子数
+    """
+    with transaction.atomic():
+        PostSearchTerm.objects.all().delete()
+        PostSearchDocument.objects.all().delete()
+
+    total = 0
+    queryset = Post.objects.order_by('postID').only('postID', 'title', 'content').prefetch_related('tags')
+    last_id = 0
+    while True:
+        posts = list(queryset.filter(postID__gt=last_id)[:batch_size])
+        if not posts:
+            break
+        terms = []
+        documents = []
+        for post in posts:
+            frequencies, length = analyze_post(post, [tag.name for tag in post.tags.all()])
+            terms.extend(PostSearchTerm(term=term, post=post, tf=tf) for term, tf in frequencies.items())
+            documents.append(PostSearchDocument(post=post, length=length))
+        with transaction.atomic():
+            PostSearchTerm.objects.bulk_create(terms, batch_size=batch_size * 10)
+            PostSearchDocument.objects.bulk_create(documents)
+        total += len(posts)
+        last_id = posts[-1].postID
+        if stdout is not None:
+            stdout.write(f'indexed {total} posts')
+    return total
+
+
+def search(query, queryset=None, limit=MAX_RESULTS):
+    """
+    按 BM25 对帖子打分
+    :param query: 查询字符串
+    :param queryset: 可选的帖子范围(例如按板块过滤), 为 None 时检索全部帖子
+    :return: 按得分降序排列的 [(postID, score)]
+    """
+    terms = set(tokenize(query))
+    if not terms:
+        return []
+
+    stats = PostSearchDocument.objects.aggregate(total=Count('post'), avg_length=Avg('length'))
+    total = stats['total'] or 0
+    avg_length = stats['avg_length'] or 1
+    if total == 0:
+        return []
+
+    # 每个词项的文档频率, 只需按 (term, post) 索引计数
+    document_frequency = dict(PostSearchTerm.objects.filter(term__in=terms).values('term')
+                              .annotate(df=Count('post')).values_list('term', 'df'))
+    if not document_frequency:
+        return []
+    idf = Case(*[When(term=term, then=Value(math.log(1 + (total - df + 0.5) / (df + 0.5))))
+                 for term, df in document_frequency.items()], default=Value(0.0), output_field=FloatField())
+    tf = Cast('tf', FloatField())
+    length = Cast(F('post__searchDocument__length'), FloatField())
+    norm = Value(K1 * (1 - B)) + Value(K1 * B / avg_length) * length
+
+    postings = PostSearchTerm.objects.filter(term__in=document_frequency)
+    if queryset is not None:
+        postings = postings.filter(post__in=queryset.values('pk'))
+    ranked = (postings.values('post_id')
+              .annotate(score=Sum(idf * tf * Value(K1 + 1) / (tf + norm), output_field=FloatField()))
+              .order_by('-score', '-post_id')
+              .values_list('post_id', 'score')[:limit])
+    return list(ranked)
+
+
+def highlight(text, query, length=None):
+    """
+    用 <em> 标出文本中命中的查询词项, 其余部分做 HTML 转义
+    :param length: 指定时截取第一个命中位置附近 length 个字符作为摘要
+    """
+    text = re.sub(r'\s+', ' ', text or '').strip()
+    spans = []
+    for term in set(tokenize(query)):
+        spans.extend(match.span() for match in re.finditer(re.escape(term), text, re.IGNORECASE))
+    spans.sort()
+
+    begin, end = 0, len(text)
+    if length is not None and len(text) > length:
+        begin = max(0, min(spans[0][0] - length // 4, len(text) - length)) if spans else 0
+        end = begin + length
+
+    # 合并重叠的命中区间, 例如 "沙河" 与 "河畔"
+    merged = []
+    for start, stop in spans:
+        start, stop = max(start, begin), min(stop, end)
+        if start >= stop:
+            continue
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], stop)
+        else:
+            merged.append([start, stop])
+
+    parts = ['…'] if begin > 0 else []
+    cursor = begin
+    for start, stop in merged:
+        parts.append(escape(text[cursor:start]))
+        parts.append('<em>%s</em>' % escape(text[start:stop]))
+        cursor = stop
+    parts.append(escape(text[cursor:end]))
+    if end < len(text):
+        parts.append('…')
+    return ''.join(parts)
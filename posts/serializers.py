@@ -1,14 +1,14 @@
 from rest_framework import serializers
 from taggit.serializers import TagListSerializerField
 import random
-from PIL import Image
-from io import BytesIO
-from django.core.files.uploadedfile import InMemoryUploadedFile
+from django.core.files.storage import default_storage
+from API import images
 from users.models import User
-from posts.models import Post, Plate, ManagePlate
+from posts import covers, search
+from posts.interactions import InteractionSerializerMixin
+from posts.models import Post, Plate, ManagePlate, PostAttachment, plain_text
 from users.descSerializers import UserDescSerializer
 from posts.descSerializers import UserDescSerializer, PlateDescSerializer, ManagePlateDescSerializer
-import sys
 
 
 # region Post
@@ -37,59 +37,92 @@ class PostCreateSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("Plate does not exist")
 
 
-class PostBaseSerializer(serializers.ModelSerializer):
+class PostBaseSerializer(InteractionSerializerMixin, serializers.ModelSerializer):
+    interaction_kind = 'post'
     tags = TagListSerializerField()
     plate = PlateDescSerializer()
     author = UserDescSerializer()
-    like_count = serializers.SerializerMethodField()
-    collect_count = serializers.SerializerMethodField()
     has_liked = serializers.SerializerMethodField()
     has_collected = serializers.SerializerMethodField()
     coverImg = serializers.SerializerMethodField()
+    # 封面缩略图的默认尺寸, 见 posts.covers.VARIANTS
+    cover_size = 'full'
 
     class Meta:
         model = Post
         fields = ('postID', 'title', 'content', 'author', 'created', 'is_essence', 'tags', 'plate', 'views', 'coverImg',
-                  'like_count', 'collect_count', 'has_liked', 'has_collected')
+                  'like_count', 'collect_count', 'comment_count', 'has_liked', 'has_collected')
         read_only_fields = ("__all__",)
 
-    def get_like_count(self, obj):
-        return obj.whoLikes.count()
-    
-    def get_collect_count(self, obj):
-        return obj.whoCollects.count()
-    
-    def get_has_liked(self, obj):
-        return obj.whoLikes.filter(user_id=self.context['request'].user).exists()
-    
-    def get_has_collected(self, obj):
-        return obj.whoCollects.filter(user_id=self.context['request'].user).exists()
-    
     def get_coverImg(self, obj):
         cover_img = obj.coverImg
         request = self.context.get('request')
         if cover_img:
-            return request.build_absolute_uri(cover_img.url)
+            # 优先使用后台生成的缩略图, 尺寸和格式可以通过 ?cover_size=&cover_format= 指定
+            params = getattr(request, 'query_params', {})
+            variant = covers.get_variant(obj, params.get('cover_size', self.cover_size), params.get('cover_format'))
+            return request.build_absolute_uri(default_storage.url(variant) if variant else cover_img.url)
         else:
             default_img_number = random.randint(1, 9)
             default_img_path = f'/api/media/covers/default-{default_img_number}.jpg'
             full_default_img_path = request.build_absolute_uri(default_img_path)
             return full_default_img_path
-    
-
 
 
 class PostsListSerializer(PostBaseSerializer):
     content = serializers.SerializerMethodField()
+    cover_size = 'card'
 
     class Meta:
         model = Post
         fields = ('postID', 'title', 'content', 'author', 'created', 'is_essence', 'tags', 'plate', 'views', 'coverImg',
-                  'like_count', 'collect_count', 'has_liked', 'has_collected')
+                  'like_count', 'collect_count', 'comment_count', 'has_liked', 'has_collected')
         read_only_fields = ("__all__",)
 
     def get_content(self, obj):
-        return obj.content[:100]
+        # 列表查询集不读取正文(Post.objects.cards()), 卡片显示预先生成的纯文本摘要
+        return obj.excerpt
+
+
+class PostSearchSerializer(PostsListSerializer):
+    """
+    Post serializer for search results, with highlighted title and content snippet
+    """
+    title_highlight = serializers.SerializerMethodField()
+    snippet = serializers.SerializerMethodField()
+    score = serializers.SerializerMethodField()
+    snippet_length = 120
+
+    class Meta:
+        model = Post
+        fields = ('postID', 'title', 'title_highlight', 'snippet', 'score', 'content', 'author', 'created',
+                  'is_essence', 'tags', 'plate', 'views', 'coverImg', 'like_count', 'collect_count', 'comment_count',
+                  'has_liked', 'has_collected')
+        read_only_fields = ("__all__",)
+
+    def get_title_highlight(self, obj):
+        return search.highlight(obj.title, self.context['query'])
+
+    def get_snippet(self, obj):
+        # 从渲染后的纯文本中截取, 不显示 Markdown 语法
+        text = plain_text(obj.content_html) or obj.excerpt
+        return search.highlight(text, self.context['query'], length=self.snippet_length)
+
+    def get_score(self, obj):
+        return round(self.context['scores'].get(obj.postID, 0), 4)
+
+
+class PostInteractionSerializer(PostsListSerializer):
+    """
+    Post serializer for the current user's liked/collected/commented posts, with the interaction time
+    """
+    interacted = serializers.DateTimeField(read_only=True)
+
+    class Meta:
+        model = Post
+        fields = ('postID', 'title', 'content', 'author', 'created', 'is_essence', 'tags', 'plate', 'views', 'coverImg',
+                  'like_count', 'collect_count', 'comment_count', 'has_liked', 'has_collected', 'interacted')
+        read_only_fields = ("__all__",)
 
 
 class PostsDetailSerializer(PostBaseSerializer):
@@ -98,9 +131,14 @@ class PostsDetailSerializer(PostBaseSerializer):
 
     class Meta:
         model = Post
-        fields = "__all__"
+        # 只列出公开字段, content_hash、hot_score、excerpt 和 cover_variants(存储中的文件名)是内部字段,
+        # 封面缩略图只通过 coverImg 返回 URL
+        fields = ('postID', 'title', 'content', 'content_html', 'content_toc', 'author', 'created', 'last_modified',
+                  'is_essence', 'tags', 'plate', 'plate_id', 'views', 'coverImg', 'like_count', 'collect_count',
+                  'comment_count', 'has_liked', 'has_collected')
         read_only_fields = (
-            'postID', 'author', 'coverImg', 'created', 'last_modified', 'views', 'whoLikes', 'whoCollects')
+            'postID', 'author', 'coverImg', 'created', 'last_modified', 'views', 'content_html', 'content_toc',
+            'like_count', 'collect_count', 'comment_count')
     
     def validated_plate_id(self, value):
         try:
@@ -111,24 +149,25 @@ class PostsDetailSerializer(PostBaseSerializer):
 
 
 class PostCoverImgSerializer(PostBaseSerializer):
+    # 上传时写入原图, 缩略图由 posts.covers 在后台生成
+    coverImg = images.ImageUploadField(write_only=True)
+
     class Meta:
         model = Post
         fields = ('postID', 'coverImg',)
         read_only_fields = ('postID',)
 
-    def save(self, **kwargs):
-        post = super().save(**kwargs)
-        
-        # 对上传的图片进行压缩
-        if post.coverImg:
-            img = Image.open(post.coverImg)
-            output = BytesIO()
-            img.save(output, format='JPEG', quality=70)
-            output.seek(0)
-            post.coverImg = InMemoryUploadedFile(output, 'ImageField', "%s.jpg" % post.coverImg.name.split('.')[0],
-                                                'image/jpeg', sys.getsizeof(output), None)
-        post.save()
-        return post
+    def to_representation(self, instance):
+        return {'postID': instance.postID, 'coverImg': self.get_coverImg(instance)}
+
+
+class PostAttachmentSerializer(serializers.ModelSerializer):
+    # 上传完成前 file 为空, 客户端根据 received 继续上传
+    class Meta:
+        model = PostAttachment
+        fields = ('attachmentID', 'post', 'uploader', 'filename', 'size', 'received', 'content_type', 'sha256',
+                  'status', 'file', 'created', 'last_modified')
+        read_only_fields = fields
 
 
 # endregion
@@ -0,0 +1,171 @@
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_save, pre_delete, post_delete, m2m_changed
+from django.dispatch import receiver
+
+from API import images
+from posts import covers, search, responsecache, tagindex, timeline, uploads
+from posts.models import Post, Plate, ManagePlate, LikeUserPost, CollectUserPost, PostAttachment
+
+# 修改这些字段时需要更新全文检索索引
+SEARCH_INDEXED_FIELDS = {'title', 'content'}
+
+
+@receiver(post_save, sender=Post)
+def update_post_search_index(sender, instance, created, update_fields=None, **kwargs):
+    if update_fields is not None and not SEARCH_INDEXED_FIELDS & set(update_fields):
+        return
+    search.index_post(instance)
+
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def update_post_search_index_on_tags(sender, instance, action, reverse, **kwargs):
+    if reverse or action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    search.index_post(instance)
+
+
+@receiver(post_save, sender=Post)
+def update_post_tag_index(sender, instance, created, update_fields=None, **kwargs):
+    # 只有板块变化会影响已有的索引记录, 标签变化由 m2m_changed 处理
+    if update_fields is not None and 'plate' not in update_fields and 'plate_id' not in update_fields:
+        return
+    tagindex.sync_post(instance)
+
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def update_post_tag_index_on_tags(sender, instance, action, reverse, **kwargs):
+    if reverse or action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    tagindex.sync_post(instance)
+
+
+@receiver(pre_delete, sender=Post)
+def collect_post_tag_pairs(sender, instance, **kwargs):
+    # 索引记录随帖子级联删除, 删除前记下受影响的计数
+    instance._tag_pairs = tagindex.get_pairs(instance.pk)
+
+
+@receiver(post_delete, sender=Post)
+def update_tag_counts_on_delete(sender, instance, **kwargs):
+    tagindex.refresh_counts(getattr(instance, '_tag_pairs', ()))
+
+
+def bump_post_versions(post):
+    # 帖子变化时使全站和所在板块(包括移动前的板块)的列表缓存失效
+    names = {responsecache.POSTS_VERSION, responsecache.plate_version(post.plate_id)}
+    loaded_plate_id = getattr(post, '_loaded_plate_id', None)
+    if loaded_plate_id is not None:
+        names.add(responsecache.plate_version(loaded_plate_id))
+    responsecache.bump_version(*names)
+
+
+@receiver(post_save, sender=Post)
+def invalidate_post_lists_on_save(sender, instance, **kwargs):
+    bump_post_versions(instance)
+
+
+@receiver(post_delete, sender=Post)
+def invalidate_post_lists_on_delete(sender, instance, **kwargs):
+    bump_post_versions(instance)
+
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def invalidate_post_lists_on_tags(sender, instance, action, reverse, **kwargs):
+    if reverse or action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    bump_post_versions(instance)
+
+
+@receiver(post_save, sender=Post)
+def update_plate_timelines(sender, instance, created, **kwargs):
+    loaded_plate_id = getattr(instance, '_loaded_plate_id', None)
+    if created:
+        transaction.on_commit(lambda: timeline.add_post(instance))
+    elif loaded_plate_id is not None and loaded_plate_id != instance.plate_id:
+        # 移动到其他板块
+        timeline.remove_post(loaded_plate_id, instance.pk)
+        transaction.on_commit(lambda: timeline.add_post(instance))
+
+
+@receiver(post_delete, sender=Post)
+def remove_from_plate_timeline(sender, instance, **kwargs):
+    timeline.remove_post(instance.plate_id, instance.pk)
+
+
+@receiver(post_save, sender=Post)
+def process_post_cover(sender, instance, update_fields=None, **kwargs):
+    # 上传了新封面时在后台生成缩略图
+    if update_fields is not None and 'coverImg' not in update_fields:
+        return
+    if instance.coverImg and (instance.cover_variants or {}).get('source') != instance.coverImg.name:
+        covers.schedule(instance)
+
+
+@receiver(post_delete, sender=Post)
+def delete_post_cover_files(sender, instance, **kwargs):
+    # 释放封面和缩略图的引用, 其他帖子或用户仍在使用的相同文件不会被删除(见 API.storage)
+    cover, variants = instance.coverImg, instance.cover_variants
+
+    def delete_files():
+        if cover:
+            cover.delete(save=False)
+        images.delete_variants(variants)
+    transaction.on_commit(delete_files)
+
+
+@receiver(post_delete, sender=PostAttachment)
+def delete_attachment_files(sender, instance, **kwargs):
+    # 取消上传、删除附件或帖子时删除未完成的分块文件并释放附件的引用
+    attachment, file = instance, instance.file
+
+    def delete_files():
+        uploads.discard(attachment)
+        if file:
+            file.delete(save=False)
+    transaction.on_commit(delete_files)
+
+
+@receiver(post_save, sender=Plate)
+@receiver(post_delete, sender=Plate)
+def invalidate_plate_lists(sender, instance, **kwargs):
+    # 帖子列表中包含板块信息, 板块变化时同时使帖子列表失效
+    responsecache.bump_version(responsecache.PLATES_VERSION, responsecache.POSTS_VERSION,
+                               responsecache.plate_version(instance.pk))
+
+
+@receiver(post_save, sender=ManagePlate)
+@receiver(post_delete, sender=ManagePlate)
+def invalidate_plate_lists_on_moderators(sender, instance, **kwargs):
+    responsecache.bump_version(responsecache.PLATES_VERSION)
+
+
+def increase_post_counter(post_id, field):
+    Post.objects.filter(pk=post_id).update(**{field: F(field) + 1})
+
+
+def decrease_post_counter(post_id, field):
+    # 计数已经为 0 时不再减少, 偏差由 reconcile_post_counters 修复
+    Post.objects.filter(pk=post_id, **{f'{field}__gt': 0}).update(**{field: F(field) - 1})
+
+
+@receiver(post_save, sender=LikeUserPost)
+def increase_like_count(sender, instance, created, **kwargs):
+    if created:
+        increase_post_counter(instance.post_id, 'like_count')
+
+
+@receiver(post_delete, sender=LikeUserPost)
+def decrease_like_count(sender, instance, **kwargs):
+    decrease_post_counter(instance.post_id, 'like_count')
+
+
+@receiver(post_save, sender=CollectUserPost)
+def increase_collect_count(sender, instance, created, **kwargs):
+    if created:
+        increase_post_counter(instance.post_id, 'collect_count')
+
+
+@receiver(post_delete, sender=CollectUserPost)
+def decrease_collect_count(sender, instance, **kwargs):
+    decrease_post_counter(instance.post_id, 'collect_count')
@@ -0,0 +1,138 @@
+"""
+帖子标签索引
+
+PostTag 保存标签 -> 帖子的倒排记录(冗余所在板块), TagCount 保存每个板块中各标签的帖子数.
+标签过滤只读取 PostTag 上 (tag, plate, post) 索引, 不再经过 taggit 的通用关联表做 LIKE 匹配;
+标签统计直接读取 TagCount. 帖子的标签或板块变化时由 posts.signals 调用 sync_post 维护.
+"""
+from django.db import transaction
+from django.db.models import Count, Sum
+from taggit.models import Tag
+
+from posts.models import Post, PostTag, TagCount
+
+AND = 'and'
+OR = 'or'
+
+
+def refresh_counts(pairs):
+    """
+    按索引重新统计一组 (tag_id, plate_id) 的帖子数
+    """
+    pairs = set(pairs)
+    if not pairs:
+        return
+    tag_ids = {tag_id for tag_id, _ in pairs}
+    plate_ids = {plate_id for _, plate_id in pairs}
+    counts = dict(
+        ((tag_id, plate_id), count) for tag_id, plate_id, count in
+        PostTag.objects.filter(tag_id__in=tag_ids, plate_id__in=plate_ids).order_by().values('tag', 'plate')
+        .annotate(count=Count('pk')).values_list('tag', 'plate', 'count')
+    )
+    with transaction.atomic():
+        for tag_id, plate_id in pairs:
+            count = counts.get((tag_id, plate_id), 0)
+            if count:
+                TagCount.objects.update_or_create(tag_id=tag_id, plate_id=plate_id, defaults={'count': count})
+            else:
+                TagCount.objects.filter(tag_id=tag_id, plate_id=plate_id).delete()
+
+
+def get_pairs(post_id):
+    return set(PostTag.objects.filter(post_id=post_id).values_list('tag', 'plate'))
+
+
+def sync_post(post):
+    """
+    使帖子的索引记录与当前的标签和板块一致, 并更新受影响的计数
+    """
+    tag_ids = set(post.tags.values_list('id', flat=True))
+    with transaction.atomic():
+        old_pairs = get_pairs(post.pk)
+        new_pairs = {(tag_id, post.plate_id) for tag_id in tag_ids}
+        if old_pairs == new_pairs:
+            return
+        PostTag.objects.filter(post_id=post.pk).exclude(tag_id__in=tag_ids).delete()
+        PostTag.objects.filter(post_id=post.pk).exclude(plate_id=post.plate_id).update(plate_id=post.plate_id)
+        existing = {tag_id for tag_id, _ in old_pairs}
+        PostTag.objects.bulk_create(
+            [PostTag(tag_id=tag_id, post_id=post.pk, plate_id=post.plate_id) for tag_id in tag_ids - existing]
+        )
+        refresh_counts(old_pairs | new_pairs)
+
+
+def rebuild_index(batch_size=1000, stdout=None):
+    """
+    清空并按 taggit 的数据重建全部索引和计数
+    :return: 索引的帖子数
+    """
+    with transaction.atomic():
+        PostTag.objects.all().delete()
+        TagCount.objects.all().delete()
+
+    total = 0
+    queryset = Post.objects.order_by('postID').only('postID', 'plate_id').prefetch_related('tags')
+    last_id = 0
+    while True:
+        posts = list(queryset.filter(postID__gt=last_id)[:batch_size])
+        if not posts:
+            break
+        PostTag.objects.bulk_create(
+            [PostTag(tag=tag, post=post, plate_id=post.plate_id) for post in posts for tag in post.tags.all()],
+            batch_size=batch_size,
+        )
+        total += len(posts)
+        last_id = posts[-1].postID
+        if stdout is not None:
+            stdout.write(f'indexed {total} posts')
+
+    TagCount.objects.bulk_create(
+        [TagCount(tag_id=tag_id, plate_id=plate_id, count=count) for tag_id, plate_id, count in
+         PostTag.objects.order_by().values('tag', 'plate').annotate(count=Count('pk'))
+         .values_list('tag', 'plate', 'count')],
+        batch_size=batch_size,
+    )
+    return total
+
+
+def parse_tags(value):
+    """
+    解析以逗号分隔的标签名, 去除空白与重复并保持顺序
+    """
+    names = []
+    for name in (value or '').split(','):
+        name = name.strip()
+        if name and name not in names:
+            names.append(name)
+    return names
+
+
+def post_ids(names, mode=AND):
+    """
+    带有指定标签的帖子ID
+    :param names: 标签名(精确匹配)
+    :param mode: AND 要求带有全部标签, OR 带有任一标签即可
+    :return: 帖子ID的子查询, 用于 Post.objects.filter(pk__in=...)
+    """
+    tag_ids = list(Tag.objects.filter(name__in=names).values_list('id', flat=True))
+    postings = PostTag.objects.filter(tag_id__in=tag_ids).order_by()
+    if mode == AND:
+        if len(tag_ids) < len(names):
+            return PostTag.objects.none().values('post')
+        return postings.values('post').annotate(matched=Count('tag')).filter(matched=len(tag_ids)).values('post')
+    return postings.values('post').distinct()
+
+
+def tag_counts(plate=None, limit=None):
+    """
+    标签及其帖子数, 按帖子数降序
+    :param plate: 指定时只统计该板块, 否则为全站
+    :return: [{'name', 'slug', 'count'}]
+    """
+    counts = TagCount.objects.all()
+    if plate is not None:
+        counts = counts.filter(plate_id=plate)
+    counts = counts.values('tag__name', 'tag__slug').annotate(total=Sum('count')).order_by('-total', 'tag__name')
+    if limit is not None:
+        counts = counts[:limit]
+    return [{'name': item['tag__name'], 'slug': item['tag__slug'], 'count': item['total']} for item in counts]
@@ -0,0 +1,154 @@
+"""
+板块时间线
+
+每个板块在缓存中保存最新 PLATE_TIMELINE_LENGTH 篇帖子的 (创建时间, 帖子ID), 按时间倒序排列.
+发帖时插入对应板块的时间线, 删帖或移动板块时从原板块移除(由 posts.signals 维护), 读取板块帖子列表时
+直接从时间线切出一页帖子ID, 再用一次 in_bulk 取出帖子, 不再对整张帖子表排序.
+时间线始终是该板块最新的若干篇帖子, 翻页超出时间线范围时回退到数据库查询.
+缓存中没有时间线时(冷启动或缓存被清空), 第一次读取时从数据库重建, 也可以用 rebuild_plate_timelines 预热.
+时间线和锁必须保存在所有 worker 共享的缓存中; 缓存后端为 LocMemCache / DummyCache 时不使用时间线, 直接查询数据库.
+"""
+import bisect
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+
+from posts.models import Post
+
+LENGTH = getattr(settings, 'PLATE_TIMELINE_LENGTH', 1000)
+# 时间线定期过期重建, 修正并发写入时可能遗漏的帖子
+TIMEOUT = 24 * 60 * 60
+
+LOCK_TIMEOUT = 5
+LOCK_RETRIES = 50
+
+
+def enabled():
+    # 进程内缓存中的时间线看不到其他进程发布的帖子, 锁也无法在进程间互斥
+    return not isinstance(caches['default'], (LocMemCache, DummyCache))
+
+
+def timeline_key(plate_id):
+    return f'plate_timeline:{plate_id}'
+
+
+@contextmanager
+def locked(plate_id):
+    """
+    修改时间线时持有的缓存锁
+    :return: 是否获得了锁
+    """
+    lock_key = f'plate_timeline:lock:{plate_id}'
+    for _ in range(LOCK_RETRIES):
+        if cache.add(lock_key, 1, timeout=LOCK_TIMEOUT):
+            try:
+                yield True
+            finally:
+                cache.delete(lock_key)
+            return
+        time.sleep(0.01)
+    yield False
+
+
+def sort_key(entry):
+    created, post_id = entry
+    return -created, -post_id
+
+
+def build(plate_id):
+    """
+    从数据库重建板块的时间线, 持有锁读取和写入, 不会覆盖并发插入的帖子; 没有获得锁时只返回结果, 不写入缓存
+    :return: {'entries': [(创建时间戳, 帖子ID)], 'complete': 是否包含了板块的全部帖子}
+    """
+    with locked(plate_id) as acquired:
+        rows = Post.objects.filter(plate_id=plate_id).order_by('-created', '-postID').values_list(
+            'created', 'postID')[:LENGTH + 1]
+        entries = [(created.timestamp(), post_id) for created, post_id in rows]
+        timeline = {'entries': entries[:LENGTH], 'complete': len(entries) <= LENGTH}
+        if acquired and enabled():
+            cache.set(timeline_key(plate_id), timeline, timeout=TIMEOUT)
+    return timeline
+
+
+def get_timeline(plate_id):
+    """
+    :return: 板块的时间线, 不使用时间线时为 None
+    """
+    if not enabled():
+        return None
+    timeline = cache.get(timeline_key(plate_id))
+    if timeline is None:
+        timeline = build(plate_id)
+    return timeline
+
+
+def add_post(post):
+    """
+    将帖子插入所在板块的时间线
+    """
+    if not enabled():
+        return
+    with locked(post.plate_id) as acquired:
+        if not acquired:
+            cache.delete(timeline_key(post.plate_id))
+            return
+        timeline = cache.get(timeline_key(post.plate_id))
+        if timeline is None:
+            # 时间线尚未建立, 下次读取时从数据库重建
+            return
+        entries = timeline['entries']
+        entry = (post.created.timestamp(), post.pk)
+        if post.pk in {post_id for _, post_id in entries}:
+            return
+        if not timeline['complete'] and entries and sort_key(entry) > sort_key(entries[-1]):
+            # 比时间线中最旧的帖子还旧, 不在时间线范围内
+            return
+        bisect.insort(entries, entry, key=sort_key)
+        if len(entries) > LENGTH:
+            del entries[LENGTH:]
+            timeline['complete'] = False
+        cache.set(timeline_key(post.plate_id), timeline, timeout=TIMEOUT)
+
+
+def remove_post(plate_id, post_id):
+    """
+    将帖子从板块的时间线中移除
+    """
+    if not enabled():
+        return
+    with locked(plate_id) as acquired:
+        if not acquired:
+            cache.delete(timeline_key(plate_id))
+            return
+        timeline = cache.get(timeline_key(plate_id))
+        if timeline is None:
+            return
+        entries = [entry for entry in timeline['entries'] if entry[1] != post_id]
+        if len(entries) != len(timeline['entries']):
+            timeline['entries'] = entries
+            cache.set(timeline_key(plate_id), timeline, timeout=TIMEOUT)
+
+
+class PlateFeed:
+    """
+    按时间倒序排列的板块帖子, 可以像查询集一样切片分页, 切片优先从时间线读取
+    """
+
+    def __init__(self, plate_id, queryset):
+        self.plate_id = plate_id
+        self.queryset = queryset
+
+    def __getitem__(self, item):
+        if not isinstance(item, slice):
+            raise TypeError('PlateFeed only supports slicing')
+        timeline = get_timeline(self.plate_id)
+        entries = timeline['entries'] if timeline is not None else []
+        if timeline is not None and (item.stop is not None and item.stop <= len(entries) or timeline['complete']):
+            post_ids = [post_id for _, post_id in entries[item]]
+            posts = self.queryset.in_bulk(post_ids)
+            return [posts[post_id] for post_id in post_ids if post_id in posts]
+        return list(self.queryset.filter(plate_id=self.plate_id).order_by('-created', '-postID')[item])
@@ -0,0 +1,282 @@
+"""
+帖子附件的分块上传
+
+1. 初始化: 声明文件名、大小和可选的整体 SHA-256, 创建状态为 uploading 的 PostAttachment
+2. 上传分块: PUT 请求体即分块内容, Content-Range: bytes 起始-结束/总大小, 可选 X-Chunk-SHA256 校验分块
+   请求体按 COPY_BUFFER_SIZE 逐段从 WSGI 输入流复制到磁盘上的 .part 文件, 不经过 request.body / request.data,
+   因此不受 DATA_UPLOAD_MAX_MEMORY_SIZE 限制, 内存占用与文件和分块大小无关.
+   分块必须从已接收的位置(received)开始, 断线后查询 received 即可从断点继续; 校验失败的分块会被截掉.
+   第一个分块写入后根据文件头(magic bytes)判断类型, 不在 FILE_UPLOAD_ALLOWED_TYPES 中的文件立即拒绝.
+   同一上传的写入和完成都持有 .part 文件的排他锁(flock), 并发的请求直接失败, 不会写入文件.
+3. 完成: 全部接收后逐块计算整体 SHA-256 并与声明值比较, 然后将 .part 文件移动到存储中(见 API.storage),
+   保存的扩展名由检测到的类型决定.
+未完成的上传由 clean_uploads 命令定期清理.
+"""
+import fcntl
+import hashlib
+import os
+import re
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.utils import timezone
+
+from posts.models import PostAttachment
+
+UPLOAD_DIR = getattr(settings, 'CHUNKED_UPLOAD_DIR', os.path.join(settings.BASE_DIR, 'tmp', 'uploads'))
+MAX_SIZE = getattr(settings, 'CHUNKED_UPLOAD_MAX_SIZE', 2 * 1024 * 1024 * 1024)
+# 建议的分块大小和允许的最大分块
+CHUNK_SIZE = getattr(settings, 'CHUNKED_UPLOAD_CHUNK_SIZE', 5 * 1024 * 1024)
+MAX_CHUNK_SIZE = getattr(settings, 'CHUNKED_UPLOAD_MAX_CHUNK_SIZE', 16 * 1024 * 1024)
+ALLOWED_TYPES = set(getattr(settings, 'FILE_UPLOAD_ALLOWED_TYPES', ()))
+
+COPY_BUFFER_SIZE = 64 * 1024
+# 判断类型需要的文件头长度, 文件更小时为整个文件
+HEAD_SIZE = 512
+
+CONTENT_RANGE_RE = re.compile(r'^bytes (\d+)-(\d+)/(\d+)$')
+
+# (偏移, 特征字节, 类型族), 同一族的具体类型由扩展名决定
+SIGNATURES = (
+    (0, b'\xff\xd8\xff', 'jpeg'),
+    (0, b'\x89PNG\r\n\x1a\n', 'png'),
+    (0, b'GIF87a', 'gif'),
+    (0, b'GIF89a', 'gif'),
+    (0, b'BM', 'bmp'),
+    (0, b'%PDF-', 'pdf'),
+    (0, b'OggS', 'ogg'),
+    (0, b'\x1a\x45\xdf\xa3', 'webm'),
+    (0, b'ID3', 'mp3'),
+    (0, b'\xff\xfb', 'mp3'),
+    (0, b'\xff\xf3', 'mp3'),
+    (0, b'\xff\xf2', 'mp3'),
+    (4, b'ftyp', 'mp4'),
+    (0, b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1', 'ole'),
+    (0, b'PK\x03\x04', 'zip'),
+)
+FAMILIES = {
+    'jpeg': {'image/jpeg'},
+    'png': {'image/png'},
+    'gif': {'image/gif'},
+    'bmp': {'image/bmp'},
+    'pdf': {'application/pdf'},
+    'ogg': {'video/ogg', 'audio/ogg'},
+    'webm': {'video/webm', 'audio/webm'},
+    'mp3': {'audio/mpeg'},
+    'mp4': {'video/mp4'},
+    'riff-webp': {'image/webp'},
+    'riff-wave': {'audio/wav'},
+    'ole': {'application/msword', 'application/vnd.ms-excel', 'application/vnd.ms-powerpoint'},
+    'zip': {
+        'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+        'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+        'application/vnd.openxmlformats-officedocument.presentationml.presentation',
+    },
+}
+EXTENSION_TYPES = {
+    '.jpg': 'image/jpeg', '.jpeg': 'image/jpeg', '.png': 'image/png', '.gif': 'image/gif', '.bmp': 'image/bmp',
+    '.webp': 'image/webp', '.pdf': 'application/pdf', '.mp4': 'video/mp4', '.m4v': 'video/mp4',
+    '.ogv': 'video/ogg', '.ogg': 'audio/ogg', '.oga': 'audio/ogg', '.webm': 'video/webm', '.weba': 'audio/webm',
+    '.mp3': 'audio/mpeg', '.wav': 'audio/wav', '.doc': 'application/msword', '.xls': 'application/vnd.ms-excel',
+    '.ppt': 'application/vnd.ms-powerpoint',
+    '.docx': 'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+    '.xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    '.pptx': 'application/vnd.openxmlformats-officedocument.presentationml.presentation',
+}
+# 保存文件时使用的扩展名, 每种类型取 EXTENSION_TYPES 中的第一个
+TYPE_EXTENSIONS = {content_type: extension for extension, content_type in reversed(EXTENSION_TYPES.items())}
+
+
+class UploadError(Exception):
+    """
+    上传请求不合法, message 返回给客户端
+    """
+
+
+def detect_family(head):
+    if head[:4] == b'RIFF' and head[8:12] in (b'WEBP', b'WAVE'):
+        return 'riff-' + head[8:12].decode().lower()
+    for offset, signature, family in SIGNATURES:
+        if head[offset:offset + len(signature)] == signature:
+            return family
+    return None
+
+
+def detect_type(head, filename):
+    """
+    根据文件头和扩展名判断类型
+    :return: MIME 类型, 文件头与扩展名不符或不允许上传时为 None
+    """
+    family = detect_family(head)
+    if family is None:
+        return None
+    candidates = FAMILIES[family] & ALLOWED_TYPES
+    declared = EXTENSION_TYPES.get(os.path.splitext(filename)[1].lower())
+    if declared in candidates:
+        return declared
+    if len(candidates) == 1:
+        # 类型唯一确定, 扩展名不影响判断, 例如 .jpe
+        return next(iter(candidates))
+    return None
+
+
+def part_path(attachment):
+    return os.path.join(UPLOAD_DIR, f'{attachment.pk}.part')
+
+
+def parse_content_range(header, size):
+    """
+    :return: (起始位置, 分块长度)
+    """
+    match = CONTENT_RANGE_RE.match((header or '').strip())
+    if not match:
+        raise UploadError('Content-Range must be "bytes start-end/total"')
+    start, end, total = map(int, match.groups())
+    if total != size or end < start or end >= size:
+        raise UploadError('Content-Range does not match the declared size')
+    length = end - start + 1
+    if length > MAX_CHUNK_SIZE:
+        raise UploadError(f'Chunks are limited to {MAX_CHUNK_SIZE} bytes')
+    return start, length
+
+
+def create(post, uploader, filename, size, sha256=''):
+    filename = os.path.basename(filename or '').strip()
+    if not filename:
+        raise UploadError('filename is required')
+    if not 0 < size <= MAX_SIZE:
+        raise UploadError(f'size must be between 1 and {MAX_SIZE} bytes')
+    if sha256 and not re.fullmatch(r'[0-9a-f]{64}', sha256):
+        raise UploadError('sha256 must be a hex digest')
+    attachment = PostAttachment.objects.create(post=post, uploader=uploader, filename=filename[:255], size=size,
+                                               sha256=sha256)
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    open(part_path(attachment), 'wb').close()
+    return attachment
+
+
+@contextmanager
+def locked_part(attachment):
+    """
+    以排他锁打开 .part 文件, 同一上传同时只有一个请求可以写入或完成; 获得锁后重新读取上传进度
+    :return: .part 文件对象
+    """
+    try:
+        part = open(part_path(attachment), 'r+b')
+    except FileNotFoundError:
+        raise UploadError('Upload is already complete or cancelled')
+    with part:
+        try:
+            fcntl.flock(part, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            raise UploadError('Another request is writing this upload, retry later')
+        try:
+            attachment.refresh_from_db(fields=['received', 'status', 'content_type', 'sha256'])
+            if attachment.status != PostAttachment.UPLOADING:
+                raise UploadError('Upload is already complete')
+            yield part
+        finally:
+            fcntl.flock(part, fcntl.LOCK_UN)
+
+
+def write_chunk(attachment, stream, start, length, checksum=None):
+    """
+    将请求体中的一个分块写入 .part 文件
+    :param stream: 请求的输入流, 逐段读取
+    :param checksum: 分块的 SHA-256(十六进制)
+    :return: 写入后已接收的字节数
+    """
+    with locked_part(attachment) as part:
+        # 持有锁时检查位置, 位置不对的请求不会写入文件
+        if start != attachment.received:
+            raise UploadError(f'Expected a chunk starting at {attachment.received}')
+        digest = hashlib.sha256()
+        written = 0
+        part.seek(start)
+        while written < length:
+            data = stream.read(min(COPY_BUFFER_SIZE, length - written))
+            if not data:
+                break
+            part.write(data)
+            digest.update(data)
+            written += len(data)
+        try:
+            if written != length:
+                raise UploadError(f'Chunk is incomplete: {written} of {length} bytes received')
+            if checksum and digest.hexdigest() != checksum.lower():
+                raise UploadError('Chunk checksum mismatch')
+            if start == 0:
+                part.flush()
+                part.seek(0)
+                content_type = detect_type(part.read(HEAD_SIZE), attachment.filename)
+                if content_type is None:
+                    raise UploadError('File type is not allowed')
+                attachment.content_type = content_type
+        except UploadError:
+            # 丢弃这个分块, 客户端可以从 received 重新上传
+            part.truncate(start)
+            raise
+        part.truncate(start + length)
+
+        # update() 不会更新 auto_now 字段, 需要手动设置, clean_uploads 据此判断上传是否停止
+        updated = PostAttachment.objects.filter(pk=attachment.pk, received=start).update(
+            received=start + length, content_type=attachment.content_type, last_modified=timezone.now())
+        if not updated:
+            raise UploadError('Upload was cancelled')
+    attachment.received = start + length
+    return attachment.received
+
+
+class PartFile(File):
+    # 提供 temporary_file_path 后, 文件系统存储会直接移动文件而不是复制内容
+    def temporary_file_path(self):
+        return self.file.name
+
+
+def file_digest(file):
+    digest = hashlib.sha256()
+    file.seek(0)
+    for data in iter(lambda: file.read(COPY_BUFFER_SIZE), b''):
+        digest.update(data)
+    return digest.hexdigest()
+
+
+def stored_name(attachment):
+    """
+    保存时的文件名, 扩展名由检测到的类型决定, 不使用客户端提供的扩展名
+    """
+    stem = os.path.splitext(attachment.filename)[0] or 'attachment'
+    return f'attachments/{stem}{TYPE_EXTENSIONS.get(attachment.content_type, "")}'
+
+
+def complete(attachment):
+    """
+    校验整体 SHA-256 并将文件保存到存储中
+    """
+    with locked_part(attachment) as part:
+        if attachment.received != attachment.size:
+            raise UploadError(f'Upload is incomplete: {attachment.received} of {attachment.size} bytes received')
+        sha256 = file_digest(part)
+        if attachment.sha256 and sha256 != attachment.sha256:
+            raise UploadError('File checksum mismatch')
+        name = default_storage.save(stored_name(attachment), PartFile(part, name=part_path(attachment)))
+        updated = PostAttachment.objects.filter(pk=attachment.pk, status=PostAttachment.UPLOADING).update(
+            file=name, sha256=sha256, status=PostAttachment.COMPLETE, last_modified=timezone.now())
+        if not updated:
+            default_storage.delete(name)
+            raise UploadError('Upload was cancelled')
+    discard(attachment)
+    attachment.refresh_from_db()
+    return attachment
+
+
+def discard(attachment):
+    """
+    删除 .part 文件(内容已移动到存储中时文件已不存在)
+    """
+    try:
+        os.remove(part_path(attachment))
+    except FileNotFoundError:
+        pass
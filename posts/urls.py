@@ -5,29 +5,41 @@ app_name = 'posts'
 urlpatterns = [
     path('', views.index, name='index'),
     path('post/list/', views.PostListView.as_view(), name='post_list'),  # 用于获取帖子列表
+    path('post/search/', views.PostSearchView.as_view(), name='post_search'),  # 用于全文搜索帖子
 
     path('post/hot/list/', views.PostHotListView.as_view(), name='post_hot_list'),  # 用于获取热门帖子列表
     path('post/essence/list/', views.PostEssenceListView.as_view(), name='post_essence_list'),  # 用于获取精华帖子列表
 
     path('post/create/', views.PostCreateView.as_view(), name='post_create'),  # 用于创建帖子
     path('post/detail/<int:pk>/', views.PostDetailView.as_view(), name='post_detail'),  # 用于获取帖子详情
+    path('post/batch/', views.PostBatchView.as_view(), name='post_batch'),  # 按ID列表批量获取帖子
     path('post/action/<int:pk>/', views.PostActionView.as_view(), name='post_action'),  # 对帖子进行操作
     path('post/like/<int:pk>/', views.PostLikeView.as_view(), name='post_like'),  # 对帖子进行点赞
     path('post/collect/<int:pk>/', views.PostCollectView.as_view(), name='post_collect'),  # 对帖子进行收藏
     path('post/coverImg/<int:pk>/', views.PostCoverImgView.as_view(), name='post_coverImg'),  # 对帖子进行封面图片操作
+    path('post/attachment/<int:pk>/', views.PostAttachmentView.as_view(), name='post_attachment'),  # 获取帖子附件列表或开始分块上传附件
+    path('attachment/upload/<int:pk>/', views.AttachmentUploadView.as_view(), name='attachment_upload'),  # 查询进度、上传分块或取消上传
+    path('attachment/upload/<int:pk>/complete/', views.AttachmentUploadCompleteView.as_view(), name='attachment_upload_complete'),  # 校验并完成上传
     path('post/comment/<int:pk>/', views.PostCommentView.as_view(), name='post_comment'),  # 对帖子进行评论
     path('post/comment/list/<int:pk>/', views.PostCommentListView.as_view(), name='post_comment_list'),  # 获取帖子评论列表
     path('post/status/<int:pk>/', views.PostStatusView.as_view(), name='post_status'),  # 获取帖子状态
+    path('post/page/<int:pk>/', views.PostPageView.as_view(), name='post_page'),  # 获取帖子详情、状态与第一页评论
 
 
     path('post/my/list/', views.MyPostListView.as_view(), name='my_post_list'),  # 获取我的帖子列表
-    # path('post/my/like/list/', views.MyPostLikeListView.as_view(), name='my_post_like_list'),  # 获取我的点赞帖子列表
-    # path('post/my/collect/list/', views.MyPostCollectListView.as_view(), name='my_post_collect_list'),  # 获取我的收藏帖子列表
-    # path('post/my/comment/list/', views.MyPostCommentListView.as_view(), name='my_post_comment_list'),  # 获取我的评论帖子列表
+    path('post/my/like/list/', views.MyPostLikeListView.as_view(), name='my_post_like_list'),  # 获取我的点赞帖子列表
+    path('post/my/collect/list/', views.MyPostCollectListView.as_view(), name='my_post_collect_list'),  # 获取我的收藏帖子列表
+    path('post/my/comment/list/', views.MyPostCommentListView.as_view(), name='my_post_comment_list'),  # 获取我的评论帖子列表
 
 
+    path('export/', views.ExportView.as_view(), name='export'),  # 以 NDJSON 流式导出数据
+    path('cache/stats/', views.ResponseCacheStatsView.as_view(), name='response_cache_stats'),  # 列表响应缓存的命中率
+
+    path('tag/list/', views.TagListView.as_view(), name='tag_list'),  # 获取标签及其帖子数
+
     path('plate/list/', views.PlateListView.as_view(), name='plate_list'),  # 用于获取板块列表
     path('plate/<int:pk>/', views.PlateDetailView.as_view(), name='plate_detail'),  # 用于获取板块详情
+    path('plate/<int:pk>/posts/', views.PlatePostListView.as_view(), name='plate_post_list'),  # 获取板块的帖子列表
     path('plate/create/', views.PlateCreateView.as_view(), name='plate_create'),  # 用于创建板块
     path('plate/action/<int:pk>/', views.PlateActionView.as_view(), name='plate_action'),  # 对板块进行操作
     path('plate/manage/list/', views.ManagePlateListView.as_view(), name='ManagePlateListView'),  # 用于获取管理板块列表
@@ -0,0 +1,114 @@
+"""
+帖子浏览量的写缓冲
+
+浏览帖子时只在进程内的计数器中累加, 后台线程每隔 POST_VIEWS_FLUSH_INTERVAL 秒把累计值批量写回数据库:
+相同增量的帖子合并为一条 UPDATE posts_post SET views = views + n WHERE postID IN (...).
+写回使用 F() 表达式在数据库中原子累加, 多个 worker 各自写回自己的计数也不会丢失更新.
+"""
+import atexit
+import logging
+import os
+import threading
+import time
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F
+
+logger = logging.getLogger('django')
+
+FLUSH_INTERVAL = getattr(settings, 'POST_VIEWS_FLUSH_INTERVAL', 10)
+
+_lock = threading.Lock()
+_buffer = Counter()
+_flusher_pid = None
+
+
+def record_view(post_id, count=1):
+    """
+    记录一次浏览, 不写数据库
+    """
+    with _lock:
+        _buffer[post_id] += count
+    _ensure_flusher()
+
+
+def pending_views(post_id):
+    """
+    返回尚未写回数据库的浏览量
+    """
+    with _lock:
+        return _buffer.get(post_id, 0)
+
+
+def flush():
+    """
+    将缓冲的浏览量写回数据库
+    :return: 写回的帖子数
+    """
+    from posts.models import Post
+
+    with _lock:
+        pending = dict(_buffer)
+        _buffer.clear()
+    if not pending:
+        return 0
+
+    grouped = defaultdict(list)
+    for post_id, count in pending.items():
+        grouped[count].append(post_id)
+    try:
+        with transaction.atomic():
+            for count, post_ids in grouped.items():
+                Post.objects.filter(pk__in=post_ids).update(views=F('views') + count)
+    except Exception:
+        # 写回失败时放回缓冲, 等待下次写回
+        with _lock:
+            _buffer.update(pending)
+        raise
+    return len(pending)
+
+
+def _run_flusher():
+    while True:
+        time.sleep(FLUSH_INTERVAL)
+        try:
+            flush()
+        except Exception:
+            logger.exception('failed to flush post views')
+        finally:
+            close_old_connections()
+
+
+def _ensure_flusher():
+    """
+    每个进程在第一次记录浏览时启动自己的写回线程
+    """
+    global _flusher_pid
+    if _flusher_pid == os.getpid():
+        return
+    with _lock:
+        if _flusher_pid == os.getpid():
+            return
+        _flusher_pid = os.getpid()
+    threading.Thread(target=_run_flusher, name='post-views-flusher', daemon=True).start()
+
+
+def _reset_after_fork():
+    # 子进程不继承父进程的缓冲, 由父进程自己写回
+    global _lock, _flusher_pid
+    _lock = threading.Lock()
+    _buffer.clear()
+    _flusher_pid = None
+
+
+def _flush_at_exit():
+    try:
+        flush()
+    except Exception:
+        logger.exception('failed to flush post views at exit')
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+atexit.register(_flush_at_exit)
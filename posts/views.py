@@ -1,19 +1,29 @@
 from django.contrib.auth.models import Group
-from django.db.models import Q
+from django.db.models import Q, Count, Exists, F, Max, OuterRef, Window
+from django.db.models.functions import RowNumber
 from django.db import transaction
-from django.http import HttpResponse, JsonResponse
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import generics
+from rest_framework.permissions import IsAdminUser
 from notifications.models import Notification
 from notifications.signals import notify
-from API.CustomPagination import CustomPagination
-from comments.models import Comment
-from posts.models import Post, Plate, LikeUserPost, CollectUserPost, ManagePlate
+from API import images
+from API.CustomPagination import CustomPagination, KeysetPagination, NoCountPagination
+from posts import export, search, responsecache, tagindex, timeline, uploads, viewcounter
+from posts.conditional import ConditionalGetMixin, make_etag
+from posts.interactions import get_interactions, LIKE, COLLECT
+from posts.responsecache import ResponseCacheMixin
+from comments.models import Comment, LikeUserComment, CollectUserComment
+from posts.models import Post, Plate, LikeUserPost, CollectUserPost, ManagePlate, PostAttachment
+from users.models import User
 from posts.permissions import (
     PostsActionPermission,
     PlateActionPermission,
     ManagePlateActionPermission,
     PostCoverImgPermission,
+    PostAttachmentPermission,
+    AttachmentUploadPermission,
 )
 from posts.serializers import (
     PostsListSerializer,
@@ -25,6 +35,9 @@ from posts.serializers import (
     ManagePlateCreateSerializer,
     ManagePlateActionSerializer,
     PostCoverImgSerializer,
+    PostSearchSerializer,
+    PostInteractionSerializer,
+    PostAttachmentSerializer,
 )
 from posts.descSerializers import (
     PlateDescSerializer,
@@ -45,7 +58,7 @@ def index(request):
 
 
 # region Post
-class PostDetailView(generics.RetrieveAPIView):
+class PostDetailView(ConditionalGetMixin, generics.RetrieveAPIView):
     """
     Retrieve a post instance with all details by postID.
     """
@@ -53,8 +66,25 @@ class PostDetailView(generics.RetrieveAPIView):
     queryset = Post.objects.all()
     serializer_class = PostsDetailSerializer
 
+    def get_validators(self, request):
+        # 浏览量由写缓冲异步写回, 不参与校验, 否则每次浏览都会使 ETag 失效;
+        # 作者头像的缩略图在后台生成, 不会更新帖子的 last_modified, 因此单独参与校验
+        user_id = request.user.pk
+        row = Post.objects.filter(pk=self.kwargs["pk"]).annotate(
+            liked=Exists(LikeUserPost.objects.filter(post=OuterRef("pk"), user_id=user_id)),
+            collected=Exists(CollectUserPost.objects.filter(post=OuterRef("pk"), user_id=user_id)),
+        ).values_list("last_modified", "like_count", "collect_count", "comment_count", "liked", "collected",
+                      "author__avatar", "author__avatar_variants").first()
+        if row is None:
+            return None, None
+        return make_etag("post", self.kwargs["pk"], user_id, *row), row[0]
+
     def get(self, request, *args, **kwargs):
         try:
+            response = self.not_modified(request)
+            if response is not None:
+                viewcounter.record_view(self.kwargs["pk"])
+                return response
             post = self.get_object()
             post.increase_views()
             serializer = PostsDetailSerializer(post, context={"request": request})
@@ -63,15 +93,19 @@ class PostDetailView(generics.RetrieveAPIView):
             return JsonResponse({"status": "fail", "message": str(e)})
 
 
-class PostListView(generics.ListAPIView):
+class PostListView(ConditionalGetMixin, ResponseCacheMixin, generics.ListAPIView):
     """
     List all posts with simple information by filter.
     """
 
     pagination_class = CustomPagination
+    count_cache_per_user = False
     queryset = Post.objects.all()
     serializer_class = PostsListSerializer
     filter_backends = [DjangoFilterBackend]
+    cursor_ordering = ("-created", "-postID")
+    response_cache_interaction_kind = "post"
+    response_cache_pk_field = "postID"
     filter_fields = {
         "postID": ["exact"],
         "title": ["icontains"],
@@ -84,14 +118,20 @@ class PostListView(generics.ListAPIView):
         "is_essence": ["exact"],
     }
 
+    def get_queryset(self):
+        queryset = self.queryset.cards()
+        # ?tags=a,b&tag_mode=and|or 通过标签索引按标签名精确过滤
+        names = tagindex.parse_tags(self.request.query_params.get("tags"))
+        if names:
+            mode = self.request.query_params.get("tag_mode", tagindex.AND)
+            if mode not in (tagindex.AND, tagindex.OR):
+                raise Exception("Invalid tag mode")
+            queryset = queryset.filter(pk__in=tagindex.post_ids(names, mode))
+        return queryset
+
     def get(self, request, *args, **kwargs):
         try:
-            queryset = self.filter_queryset(self.get_queryset())
-            page = self.paginate_queryset(queryset)
-            if page is None:
-                raise Exception("page is None")
-            serializer = self.get_serializer(page, many=True, context={"request": request})
-            return self.get_paginated_response(serializer.data)
+            return self.conditional_json(request, self.get_cached_payload(request))
         except Exception as e:
             return JsonResponse({"status": "fail", "message": str(e)})
 
@@ -112,42 +152,113 @@ class PostListView(generics.ListAPIView):
             return JsonResponse({"status": "fail", "message": str(e)})
 
 
-class PostHotListView(generics.ListAPIView):
+class PostSearchView(generics.ListAPIView):
+    """
+    Full-text search posts, ranked by BM25 with highlighted snippets.
+    """
+
+    pagination_class = CustomPagination
+    count_cache_per_user = False
+    queryset = Post.objects.all()
+    serializer_class = PostSearchSerializer
+
+    def get(self, request, *args, **kwargs):
+        """
+        :param request: query_params: {'q': 'xxx', 'plate': 'xxx'(可选)}
+        """
+        try:
+            query = request.query_params.get("q", "").strip()
+            if not query:
+                raise Exception("q is required")
+            scope = None
+            if request.query_params.get("plate"):
+                scope = self.get_queryset().filter(plate__plateID=request.query_params["plate"])
+            ranked = search.search(query, scope)
+            page = self.paginate_queryset(ranked)
+            if page is None:
+                raise Exception("page is None")
+            scores = dict(page)
+            posts = self.get_queryset().feed().defer("content", "content_toc", "content_hash").in_bulk(list(scores))
+            page_posts = [posts[post_id] for post_id in scores if post_id in posts]
+            serializer = self.get_serializer(page_posts, many=True,
+                                             context={"request": request, "query": query, "scores": scores})
+            return self.get_paginated_response(serializer.data)
+        except Exception as e:
+            return JsonResponse({"status": "fail", "message": str(e)})
+
+
+class PostHotListView(ConditionalGetMixin, ResponseCacheMixin, generics.ListAPIView):
     """
     List all hot posts with simple information by filter.
+    Posts are ordered by the precomputed hot_score, optionally within one plate (?plate=<plateID>).
     """
 
     pagination_class = CustomPagination
+    count_cache_per_user = False
     queryset = Post.objects.all()
     serializer_class = PostsListSerializer
     filter_backends = [DjangoFilterBackend]
+    cursor_ordering = ("-hot_score", "-postID")
+    response_cache_interaction_kind = "post"
+    response_cache_pk_field = "postID"
 
     def get_queryset(self):
-        return self.queryset.order_by("-views")
+        queryset = self.queryset.cards().order_by("-hot_score", "-postID")
+        plate = self.request.query_params.get("plate")
+        if plate:
+            queryset = queryset.filter(plate__plateID=plate)
+        return queryset
+
+    def get_response_cache_versions(self, request):
+        plate = request.query_params.get("plate")
+        if plate:
+            return [responsecache.plate_version(plate)]
+        return [responsecache.POSTS_VERSION]
 
     def get(self, request, *args, **kwargs):
         try:
-            queryset = self.filter_queryset(self.get_queryset())
-            page = self.paginate_queryset(queryset)
-            if page is None:
-                raise Exception("page is None")
-            serializer = self.get_serializer(page, many=True, context={"request": request})
-            return self.get_paginated_response(serializer.data)
+            return self.conditional_json(request, self.get_cached_payload(request))
         except Exception as e:
             return JsonResponse({"status": "fail", "message": str(e)})
         
-class PostEssenceListView(generics.ListAPIView):
+class PostEssenceListView(ConditionalGetMixin, ResponseCacheMixin, generics.ListAPIView):
     """
     List all essence posts with simple information by filter.
     """
     
     pagination_class = CustomPagination
+    count_cache_per_user = False
     queryset = Post.objects.all()
     serializer_class = PostsListSerializer
     filter_backends = [DjangoFilterBackend]
+    cursor_ordering = ("-created", "-postID")
+    response_cache_interaction_kind = "post"
+    response_cache_pk_field = "postID"
 
     def get_queryset(self):
-        return self.queryset.filter(is_essence=True)
+        return self.queryset.cards().filter(is_essence=True)
+
+    def get(self, request, *args, **kwargs):
+        try:
+            return self.conditional_json(request, self.get_cached_payload(request))
+        except Exception as e:
+            return JsonResponse({"status": "fail", "message": str(e)})
+
+
+class MyPostListView(generics.ListAPIView):
+    """
+    List all posts posted by current user.
+    """
+
+    pagination_class = CustomPagination
+    queryset = Post.objects.all()
+    serializer_class = PostsListSerializer
+    filter_backends = [DjangoFilterBackend]
+    cursor_ordering = ("-created", "-postID")
+    count_cache_per_user = True
+
+    def get_queryset(self):
+        return self.queryset.cards().filter(author=self.request.user)
 
     def get(self, request, *args, **kwargs):
         try:
@@ -161,18 +272,26 @@ class PostEssenceListView(generics.ListAPIView):
             return JsonResponse({"status": "fail", "message": str(e)})
 
 
-class MyPostListView(generics.ListAPIView):
+class MyPostInteractionListView(generics.ListAPIView):
     """
-    List all posts posted by current user.
+    Base view listing posts the current user interacted with, latest interaction first.
     """
 
-    pagination_class = CustomPagination
+    pagination_class = KeysetPagination
     queryset = Post.objects.all()
-    serializer_class = PostsListSerializer
-    filter_backends = [DjangoFilterBackend]
+    serializer_class = PostInteractionSerializer
+    # interacted 为互动时间的注解, 同一时间的多条互动按帖子ID区分先后
+    cursor_ordering = ("-interacted", "-postID")
+    # 互动记录的反向关系、其中表示用户的字段, 以及由互动记录的 created 得到 interacted 的表达式
+    interaction_path = "whoLikes"
+    interaction_user_field = "user"
+    interaction_time = F
 
     def get_queryset(self):
-        return self.queryset.filter(author=self.request.user)
+        # 过滤与注解使用同一个 join, 查询从 (user, created, post) 索引按时间倒序读取
+        user_filter = {f"{self.interaction_path}__{self.interaction_user_field}": self.request.user}
+        return self.queryset.filter(**user_filter).annotate(
+            interacted=self.interaction_time(f"{self.interaction_path}__created")).cards()
 
     def get(self, request, *args, **kwargs):
         try:
@@ -186,6 +305,97 @@ class MyPostListView(generics.ListAPIView):
             return JsonResponse({"status": "fail", "message": str(e)})
 
 
+class MyPostLikeListView(MyPostInteractionListView):
+    """
+    List posts liked by current user.
+    """
+
+
+class MyPostCollectListView(MyPostInteractionListView):
+    """
+    List posts collected by current user.
+    """
+
+    interaction_path = "whoCollects"
+
+
+class MyPostCommentListView(MyPostInteractionListView):
+    """
+    List posts commented by current user, ordered by the user's latest comment.
+    """
+
+    # 按帖子分组取最后一次评论的时间, 游标条件落在 HAVING 上
+    interaction_path = "comments"
+    interaction_user_field = "author"
+    interaction_time = Max
+
+
+class PostBatchView(generics.GenericAPIView):
+    """
+    Get several posts by a list of postIDs in one request, without increasing views.
+    """
+
+    queryset = Post.objects.all()
+    # 单次请求最多的帖子数
+    max_ids = 100
+    serializer_classes = {
+        "card": PostsListSerializer,
+        "detail": PostsDetailSerializer,
+    }
+
+    def get_ids(self, request):
+        """
+        ?ids=1,2,3 或 POST {"ids": [1, 2, 3]}, 去重并保持请求的顺序
+        """
+        if request.method == "POST":
+            values = request.data.get("ids") or []
+        else:
+            values = (request.query_params.get("ids") or "").split(",")
+        if not isinstance(values, (list, tuple)):
+            raise ValueError("ids must be a list of post IDs")
+        ids = []
+        for value in values:
+            if str(value).strip() == "":
+                continue
+            try:
+                post_id = int(value)
+            except (TypeError, ValueError):
+                raise ValueError(f"Invalid post ID: {value!r}")
+            if post_id not in ids:
+                ids.append(post_id)
+        if len(ids) > self.max_ids:
+            raise ValueError(f"At most {self.max_ids} posts per request")
+        return ids
+
+    def get_posts(self, request):
+        ids = self.get_ids(request)
+        representation = request.query_params.get("view") or request.data.get("view") or "card"
+        if representation not in self.serializer_classes:
+            raise ValueError(f"view must be one of: {', '.join(self.serializer_classes)}")
+        # 与详情页一样不做可见性过滤, 只跳过不存在的帖子, 在 missing 中返回
+        queryset = self.get_queryset().feed() if representation == "detail" else self.get_queryset().cards()
+        posts = queryset.in_bulk(ids)
+        found = [posts[post_id] for post_id in ids if post_id in posts]
+        serializer = self.serializer_classes[representation](found, many=True, context={"request": request})
+        return JsonResponse({
+            "status": "success",
+            "posts": serializer.data,
+            "missing": [post_id for post_id in ids if post_id not in posts],
+        })
+
+    def get(self, request, *args, **kwargs):
+        try:
+            return self.get_posts(request)
+        except Exception as e:
+            return JsonResponse({"status": "fail", "message": str(e)})
+
+    def post(self, request, *args, **kwargs):
+        try:
+            return self.get_posts(request)
+        except Exception as e:
+            return JsonResponse({"status": "fail", "message": str(e)})
+
+
 class PostCreateView(generics.CreateAPIView):
     """
     Create a post instance.
@@ -314,7 +524,7 @@ class PostCoverImgView(generics.GenericAPIView):
             post = self.get_object()
             serializer = self.searliazer_class(post, data=request.data, context={"request": request})
             serializer.is_valid(raise_exception=True)
-            post.coverImg.delete()
+            post.coverImg.delete(save=False)
             serializer.save()
             post_info = serializer.data
             return JsonResponse({"status": "success", "post": post_info})
@@ -324,8 +534,10 @@ class PostCoverImgView(generics.GenericAPIView):
     def delete(self, request, *args, **kwargs):
         try:
             post = self.get_object()
-            post.coverImg.delete()
-            post.save()
+            post.coverImg.delete(save=False)
+            images.delete_variants(post.cover_variants)
+            post.cover_variants = {}
+            post.save(update_fields=['coverImg', 'cover_variants'])
             return JsonResponse(
                 {"status": "success", "message": "delete coverImg success"}
             )
@@ -333,6 +545,107 @@ class PostCoverImgView(generics.GenericAPIView):
             return JsonResponse({"status": "fail", "message": str(e)})
 
 
+class PostAttachmentView(generics.GenericAPIView):
+    """
+    List a post's attachments or start a chunked attachment upload by postID.
+    """
+
+    serializer_class = PostAttachmentSerializer
+    permission_classes = [PostAttachmentPermission]
+
+    def get_object(self):
+        return Post.objects.get(pk=self.kwargs["pk"])
+
+    def get(self, request, *args, **kwargs):
+        try:
+            attachments = PostAttachment.objects.filter(post_id=self.kwargs["pk"], status=PostAttachment.COMPLETE)
+            attachments_info = self.get_serializer(attachments, many=True).data
+            return JsonResponse({"status": "success", "attachments": attachments_info})
+        except Exception as e:
+            return JsonResponse({"status": "fail", "message": str(e)})
+
+    def post(self, request, *args, **kwargs):
+        try:
+            attachment = uploads.create(
+                self.get_object(),
+                request.user,
+                request.data.get("filename"),
+                int(request.data.get("size", 0)),
+                str(request.data.get("sha256", "")).lower(),
+            )
+            attachment_info = self.get_serializer(attachment).data
+            return JsonResponse(
+                {"status": "success", "attachment": attachment_info, "chunk_size": uploads.CHUNK_SIZE}
+            )
+        except Exception as e:
+            return JsonResponse({"status": "fail", "message": str(e)})
+
+
+class AttachmentUploadView(generics.GenericAPIView):
+    """
+    Query, append a chunk to or cancel a chunked attachment upload by attachmentID.
+
+    PUT the raw chunk bytes with "Content-Range: bytes start-end/size" and optionally "X-Chunk-SHA256";
+    start must equal the received offset returned by GET.
+    """
+
+    serializer_class = PostAttachmentSerializer
+    permission_classes = [AttachmentUploadPermission]
+
+    def get_object(self):
+        return generics.get_object_or_404(PostAttachment, pk=self.kwargs["pk"])
+
+    def get(self, request, *args, **kwargs):
+        try:
+            attachment_info = self.get_serializer(self.get_object()).data
+            return JsonResponse({"status": "success", "attachment": attachment_info})
+        except Exception as e:
+            return JsonResponse({"status": "fail", "message": str(e)})
+
+    def put(self, request, *args, **kwargs):
+        # 请求体直接从输入流写入磁盘, 不能访问 request.data
+        attachment = self.get_object()
+        try:
+            start, length = uploads.parse_content_range(request.headers.get("Content-Range"), attachment.size)
+            if request.stream is None:
+                raise uploads.UploadError("Chunk is empty")
+            received = uploads.write_chunk(
+                attachment, request.stream, start, length, request.headers.get("X-Chunk-SHA256")
+            )
+            return JsonResponse({"status": "success", "received": received})
+        except Exception as e:
+            # 返回当前的 received, 客户端从这里继续上传
+            attachment.refresh_from_db(fields=["received"])
+            return JsonResponse({"status": "fail", "message": str(e), "received": attachment.received})
+
+    def delete(self, request, *args, **kwargs):
+        try:
+            self.get_object().delete()
+            return JsonResponse({"status": "success", "message": "delete attachment success"})
+        except Exception as e:
+            return JsonResponse({"status": "fail", "message": str(e)})
+
+
+class AttachmentUploadCompleteView(generics.GenericAPIView):
+    """
+    Verify a fully received chunked upload and attach the file to its post.
+    """
+
+    serializer_class = PostAttachmentSerializer
+    permission_classes = [AttachmentUploadPermission]
+
+    def get_object(self):
+        return generics.get_object_or_404(PostAttachment, pk=self.kwargs["pk"])
+
+    def post(self, request, *args, **kwargs):
+        try:
+            attachment = uploads.complete(self.get_object())
+            attachment_info = self.get_serializer(attachment).data
+            return JsonResponse({"status": "success", "attachment": attachment_info})
+        except Exception as e:
+            return JsonResponse({"status": "fail", "message": str(e)})
+
+
 class PostLikeView(generics.GenericAPIView):
     """
     Like or unlike a post instance by postID.
@@ -428,16 +741,81 @@ class PostStatusView(generics.GenericAPIView):
     def get(self, request, *args, **kwargs):
         try:
             post = self.get_object()
+            interactions = get_interactions(request)
             return JsonResponse({"status": "success", "post": {
                 "postID": post.postID,
                 "userID": request.user.userID,
-                "has_liked": post.whoLikes.filter(user_id=request.user.userID).exists(),
-                "has_collected": post.whoCollects.filter(user_id=request.user.userID).exists(),
+                "has_liked": interactions.has("post", LIKE, post.postID),
+                "has_collected": interactions.has("post", COLLECT, post.postID),
             }})
         except Exception as e:
             return JsonResponse({"status": "fail", "message": str(e)})
 
 
+class PostPageView(generics.GenericAPIView):
+    """
+    Get post details, the viewer's status and the first page of threaded comments by postID.
+    """
+
+    # 第一页的一级评论数, 以及每条一级评论下附带的回复数, 其余回复通过评论列表接口获取
+    comment_page_size = 10
+    reply_page_size = 3
+
+    def get_object(self):
+        return Post.objects.feed().get(pk=self.kwargs["pk"])
+
+    def get_comments(self, post):
+        """
+        一次查询取出第一页一级评论, 一次查询取出这些评论的前几条回复
+        :return: (一级评论, {一级评论ID: [回复]}, 是否还有更多一级评论)
+        """
+        roots = list(
+            Comment.objects.thread()
+            .filter(post=post, parent=None)
+            .order_by("created", "commentID")[: self.comment_page_size + 1]
+        )
+        has_more = len(roots) > self.comment_page_size
+        roots = roots[: self.comment_page_size]
+        replies = Comment.objects.thread().filter(parent__in=roots).annotate(
+            row=Window(RowNumber(), partition_by=F("parent"), order_by=(F("created").asc(), F("commentID").asc()))
+        ).filter(row__lte=self.reply_page_size).order_by("created", "commentID")
+        grouped = {root.commentID: [] for root in roots}
+        for reply in replies:
+            grouped[reply.parent_id].append(reply)
+        return roots, grouped, has_more
+
+    def get(self, request, *args, **kwargs):
+        try:
+            post = self.get_object()
+            post.increase_views()
+            roots, grouped, has_more = self.get_comments(post)
+
+            # 帖子与全部评论的点赞/收藏状态各一次查询取出
+            interactions = get_interactions(request)
+            interactions.load("post", [post.postID])
+            interactions.load("comment", [comment.commentID for comment in roots] +
+                              [reply.commentID for replies in grouped.values() for reply in replies])
+
+            context = {"request": request}
+            comments = CommentListSerializer(roots, many=True, context=context).data
+            for comment in comments:
+                comment["replies"] = CommentListSerializer(
+                    grouped[comment["commentID"]], many=True, context=context).data
+            return JsonResponse({
+                "status": "success",
+                "post": PostsDetailSerializer(post, context=context).data,
+                "post_status": {
+                    "postID": post.postID,
+                    "userID": request.user.userID,
+                    "has_liked": interactions.has("post", LIKE, post.postID),
+                    "has_collected": interactions.has("post", COLLECT, post.postID),
+                },
+                "comments": {"results": comments, "has_more": has_more},
+            })
+        except Exception as e:
+            return JsonResponse({"status": "fail", "message": str(e)})
+
+
 # endregion
 
 
@@ -483,17 +861,38 @@ class PostCommentView(generics.GenericAPIView):
             return JsonResponse({"status": "fail", "message": str(e)})
 
 
-class PostCommentListView(generics.ListAPIView):
+class PostCommentListView(ConditionalGetMixin, generics.ListAPIView):
     queryset = Comment.objects.all()
     serializer_class = CommentListSerializer
 
     def get_object(self):
         return Post.objects.get(pk=self.kwargs["pk"])
 
+    def get_validators(self, request):
+        # 点赞/收藏记录的主键只增不减, 数量与最大主键一起即可发现记录的任何增删;
+        # 评论、点赞、收藏分别聚合, 每次都是按外键索引的查询, 避免三者连接后的笛卡尔积
+        post_id = self.kwargs["pk"]
+        if not Post.objects.filter(pk=post_id).exists():
+            return None, None
+        comments = Comment.objects.filter(post_id=post_id).aggregate(count=Count("pk"), modified=Max("last_modified"))
+        likes = LikeUserComment.objects.filter(comment__post_id=post_id).aggregate(count=Count("pk"), last=Max("pk"))
+        collects = CollectUserComment.objects.filter(comment__post_id=post_id).aggregate(
+            count=Count("pk"), last=Max("pk"))
+        # 评论中嵌入了作者和被回复用户的头像, 头像变化不会更新评论的 last_modified
+        users = Comment.objects.filter(post_id=post_id)
+        avatars = list(User.objects.filter(Q(pk__in=users.values("author_id")) | Q(pk__in=users.values("reply_to_id")))
+                       .order_by("pk").values_list("pk", "avatar", "avatar_variants"))
+        row = (comments["modified"], comments["count"], likes["count"], likes["last"], collects["count"],
+               collects["last"], avatars)
+        return make_etag("comments", self.kwargs["pk"], request.user.pk, *row), row[0]
+
     def get(self, request, *args, **kwargs):
         try:
+            response = self.not_modified(request)
+            if response is not None:
+                return response
             post = self.get_object()
-            queryset = self.filter_queryset(self.get_queryset()).filter(post=post)
+            queryset = self.filter_queryset(self.get_queryset().thread()).filter(post=post)
             serializer = self.get_serializer(queryset, many=True, context={"request": request})
             return JsonResponse({"status": "success", "comments": serializer.data})
         except Exception as e:
@@ -503,9 +902,45 @@ class PostCommentListView(generics.ListAPIView):
 # endregion
 
 
+# region Tag
+class TagListView(ResponseCacheMixin, generics.GenericAPIView):
+    """
+    List tags with their post counts, optionally within a plate.
+    """
+
+    # 未指定 limit 时返回的标签数和允许的最大值
+    default_limit = 100
+    max_limit = 500
+
+    def get_response_cache_versions(self, request):
+        plate = request.query_params.get("plate")
+        if plate:
+            return [responsecache.plate_version(plate)]
+        return [responsecache.POSTS_VERSION]
+
+    def get_response_payload(self, request):
+        plate = request.query_params.get("plate")
+        try:
+            limit = int(request.query_params.get("limit", self.default_limit))
+        except (TypeError, ValueError):
+            limit = self.default_limit
+        limit = min(max(limit, 1), self.max_limit)
+        return {"status": "success", "results": tagindex.tag_counts(plate=plate or None, limit=limit)}
+
+    def get(self, request, *args, **kwargs):
+        try:
+            return JsonResponse(self.get_cached_payload(request))
+        except Exception as e:
+            return JsonResponse({"status": "fail", "message": str(e)})
+
+
+# endregion
+
+
 # region Plate
-class PlateListView(generics.ListAPIView):
+class PlateListView(ConditionalGetMixin, ResponseCacheMixin, generics.ListAPIView):
     pagination_class = CustomPagination
+    count_cache_per_user = False
     queryset = Plate.objects.all()
     serializer_class = PlateListSerializer
     filter_backends = [DjangoFilterBackend]
@@ -514,6 +949,17 @@ class PlateListView(generics.ListAPIView):
         "name": ["contains"],
     }
 
+    def get_response_cache_versions(self, request):
+        return [responsecache.PLATES_VERSION]
+
+    def get_response_payload(self, request):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        if page is None:
+            raise Exception("page is None")
+        serializer = self.get_serializer(queryset, many=True)
+        return self.paginator.get_paginated_data(serializer.data)
+
     def post(self, request, *args, **kwargs):
         try:
             query_filters = Q()
@@ -535,22 +981,67 @@ class PlateListView(generics.ListAPIView):
 
     def get(self, request, *args, **kwargs):
         try:
-            queryset = self.filter_queryset(self.get_queryset())
-            page = self.paginate_queryset(queryset)
-            if page is None:
-                raise Exception("page is None")
-            serializer = self.get_serializer(queryset, many=True)
-            return self.get_paginated_response(serializer.data)
+            return self.conditional_json(request, self.get_cached_payload(request))
+        except Exception as e:
+            return JsonResponse({"status": "fail", "message": str(e)})
+
+
+class ResponseCacheStatsView(generics.GenericAPIView):
+    """
+    Hit and miss statistics of the list response cache.
+    """
+
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, *args, **kwargs):
+        try:
+            return JsonResponse({"status": "success", "stats": responsecache.get_stats()})
+        except Exception as e:
+            return JsonResponse({"status": "fail", "message": str(e)})
+
+
+class ExportView(generics.GenericAPIView):
+    """
+    Stream posts, comments, likes, collects and notifications as NDJSON.
+    """
+
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, *args, **kwargs):
+        try:
+            types = [name for name in request.query_params.get("types", ",".join(export.TYPES)).split(",") if name]
+            if set(types) - set(export.TYPES):
+                raise Exception("Invalid types")
+            cursor = request.query_params.get("cursor")
+            export.parse_cursor(cursor)
+            lines = export.iter_lines(types, cursor=cursor)
+            if request.query_params.get("gzip"):
+                response = StreamingHttpResponse(export.gzip_stream(lines), content_type="application/gzip")
+                response["Content-Disposition"] = 'attachment; filename="export.ndjson.gz"'
+            else:
+                response = StreamingHttpResponse(lines, content_type="application/x-ndjson")
+                response["Content-Disposition"] = 'attachment; filename="export.ndjson"'
+            return response
         except Exception as e:
             return JsonResponse({"status": "fail", "message": str(e)})
 
 
-class PlateDetailView(generics.RetrieveAPIView):
+class PlateDetailView(ConditionalGetMixin, generics.RetrieveAPIView):
     queryset = Plate.objects.all()
     serializer_class = PlateDetailSerializer
 
+    def get_validators(self, request):
+        # 板块及版主的任何变化都会递增板块版本号, 只需按主键确认板块存在
+        if not Plate.objects.filter(pk=self.kwargs["pk"]).exists():
+            return None, None
+        version, = responsecache.get_versions([responsecache.PLATES_VERSION])
+        return make_etag("plate", self.kwargs["pk"], version), None
+
     def get(self, request, *args, **kwargs):
         try:
+            response = self.not_modified(request)
+            if response is not None:
+                return response
             plate = self.get_object()
             serializer = self.get_serializer(plate)
             return JsonResponse({"status": "success", "plate": serializer.data})
@@ -558,6 +1049,27 @@ class PlateDetailView(generics.RetrieveAPIView):
             return JsonResponse({"status": "fail", "message": str(e)})
 
 
+class PlatePostListView(generics.ListAPIView):
+    """
+    List posts of a plate, newest first, served from the plate timeline.
+    """
+
+    pagination_class = NoCountPagination
+    queryset = Post.objects.all()
+    serializer_class = PostsListSerializer
+
+    def get(self, request, *args, **kwargs):
+        try:
+            feed = timeline.PlateFeed(self.kwargs["pk"], self.queryset.cards())
+            page = self.paginate_queryset(feed)
+            if page is None:
+                raise Exception("page is None")
+            serializer = self.get_serializer(page, many=True, context={"request": request})
+            return self.get_paginated_response(serializer.data)
+        except Exception as e:
+            return JsonResponse({"status": "fail", "message": str(e)})
+
+
 class PlateCreateView(generics.CreateAPIView):
     permission_classes = [PlateActionPermission]
     queryset = Plate.objects.all()
@@ -619,6 +1131,7 @@ class PlateActionView(generics.RetrieveUpdateDestroyAPIView):
 
 class ManagePlateListView(generics.ListAPIView):
     pagination_class = CustomPagination
+    count_cache_per_user = False
     queryset = ManagePlate.objects.all()
     serializer_class = ManagePlateListSerializer
     filter_backends = [DjangoFilterBackend]
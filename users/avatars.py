@@ -0,0 +1,63 @@
+"""
+用户头像的多尺寸图片
+
+上传头像时只保存原图, 事务提交后由 API.images 的线程池在后台裁剪为正方形并生成 small / medium / large 三种尺寸,
+每种尺寸各编码为 WebP 和 JPEG, 结果记录在 User.avatar_variants 中, 格式与帖子封面相同(见 posts.covers).
+帖子、评论、通知中嵌入的用户信息(UserDescSerializer)只引用 small 尺寸.
+已有头像可以用 process_avatars 命令批量生成.
+"""
+import posixpath
+import secrets
+
+from API import images
+from posts import responsecache
+from users.models import User
+
+# 各尺寸的边长(像素), 原图更小时不放大
+VARIANTS = {
+    'small': 48,
+    'medium': 96,
+    'large': 256,
+}
+UPLOAD_TO = 'avatars/variants'
+
+
+def get_variant(user, size, fmt=None):
+    """
+    :return: 缩略图的文件名, 缩略图未生成或已过期时为 None
+    """
+    return images.pick_variant(user.avatar_variants, user.avatar.name, size, fmt)
+
+
+def process(user_id, force=False):
+    """
+    为用户当前的头像生成缩略图, 头像在处理期间被更换时丢弃结果
+    :param force: 缩略图已是最新时也重新生成
+    :return: 是否生成了缩略图
+    """
+    user = User.objects.filter(pk=user_id).only('userID', 'avatar', 'avatar_variants').first()
+    if user is None or not user.avatar:
+        return False
+    source = user.avatar.name
+    if not force and (user.avatar_variants or {}).get('source') == source:
+        return False
+    # 文件名带随机后缀, 删除后也不会被复用, 可以长期缓存(见 API.media)
+    stem = f'{user.pk}-{posixpath.splitext(posixpath.basename(source))[0]}-{secrets.token_hex(4)}'
+    variants = images.render_variants(user.avatar, VARIANTS, UPLOAD_TO, stem, square=True)
+    variants['source'] = source
+    # 用户没有 last_modified, 嵌入头像的帖子详情和评论列表的 ETag 直接包含 avatar_variants(见 posts.views)
+    updated = User.objects.filter(pk=user.pk, avatar=source).update(avatar_variants=variants)
+    if not updated:
+        images.delete_variants(variants)
+        return False
+    images.delete_variants(user.avatar_variants)
+    # 缓存的帖子列表中嵌入了作者头像
+    responsecache.bump_version(responsecache.POSTS_VERSION)
+    return True
+
+
+def schedule(user):
+    """
+    事务提交后在后台生成用户头像的缩略图
+    """
+    images.schedule(process, user.pk)
@@ -1,16 +1,30 @@
+from django.core.files.storage import default_storage
 from rest_framework import serializers
+from users import avatars
 from users.models import User
 
 class UserDescSerializer(serializers.ModelSerializer):
     """
     User serializer for user description in other models
     """
+    avatar = serializers.SerializerMethodField()
+    # 嵌入帖子、评论等处的用户信息只需要小尺寸头像, 格式可以通过 ?avatar_format= 指定
+    avatar_size = 'small'
 
     class Meta:
         model = User
         fields = ('userID', 'username', 'status', 'avatar')
         read_only_fields = ('userID', 'username', 'status', 'avatar')
 
+    def get_avatar(self, obj):
+        if not obj.avatar:
+            return None
+        request = self.context.get('request')
+        params = getattr(request, 'query_params', {})
+        variant = avatars.get_variant(obj, self.avatar_size, params.get('avatar_format'))
+        url = default_storage.url(variant) if variant else obj.avatar.url
+        return request.build_absolute_uri(url) if request is not None else url
+
 
 class UserBriefSerializer(serializers.ModelSerializer):
     """
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from users import avatars
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = 'Generate the resized avatar variants of users whose variants are missing or out of date'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', help='user ID to process, repeatable (default: all)')
+        parser.add_argument('--force', action='store_true', help='regenerate all variants, e.g. after changing sizes')
+
+    def handle(self, *args, **options):
+        queryset = User.objects.exclude(avatar='').exclude(avatar__isnull=True).order_by('userID')
+        if options['user']:
+            queryset = queryset.filter(userID__in=options['user'])
+        processed = failed = 0
+        for user_id in queryset.values_list('userID', flat=True).iterator():
+            try:
+                processed += avatars.process(user_id, force=options['force'])
+            except Exception as e:
+                failed += 1
+                self.stderr.write(f'user {user_id}: {e}')
+        self.stdout.write(self.style.SUCCESS(f'{processed} avatars processed, {failed} failed'))
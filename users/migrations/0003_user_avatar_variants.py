@@ -0,0 +1,18 @@
+# Generated by Django 4.2.6 on 2026-10-17 10:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_remove_user_plates_user_status_alter_user_avatar'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='avatar_variants',
+            field=models.JSONField(blank=True, default=dict, verbose_name='头像缩略图'),
+        ),
+    ]
@@ -11,6 +11,8 @@ class User(AbstractUser):
     email = models.EmailField(unique=True, verbose_name='邮箱')
     sex = models.CharField(max_length=10, null=True, blank=True, verbose_name='性别')
     avatar = models.ImageField(upload_to='avatars', null=True, blank=True, verbose_name='头像')
+    # 后台生成的头像缩略图, 见 users.avatars
+    avatar_variants = models.JSONField(default=dict, blank=True, verbose_name='头像缩略图')
     stuID = models.CharField(max_length=20, null=True, blank=True, verbose_name='学号')
     college = models.CharField(max_length=100, null=True, blank=True, verbose_name='学院')
     major = models.CharField(max_length=100, null=True, blank=True, verbose_name='专业')
@@ -1,6 +1,8 @@
 from rest_framework import serializers
 from notifications.models import Notification
 
+from API import images
+from users import avatars
 from users.models import User
 from posts.models import Post, Plate, LikeUserPost, CollectUserPost
 from comments.models import Comment, LikeUserComment, CollectUserComment
@@ -57,6 +59,7 @@ class UserProfileSerializer(serializers.ModelSerializer):
     User serializer for user profile
     个人主页显示的基本信息
     """
+    avatar = images.ImageUploadField(required=False, allow_null=True)
 
     class Meta:
         model = User
@@ -69,18 +72,29 @@ class UserProfileSerializer(serializers.ModelSerializer):
     def update(self, instance, validated_data):
         if 'password' in validated_data:
             instance.set_password(validated_data.pop('password'))
-        return super().update(instance, validated_data)
+        instance = super().update(instance, validated_data)
+        if validated_data.get('avatar'):
+            avatars.schedule(instance)
+        return instance
 
 
 class UserAvatarSerializer(serializers.ModelSerializer):
     """
     User serializer for user avatar
     """
+    avatar = images.ImageUploadField(required=False, allow_null=True)
 
     class Meta:
         model = User
         fields = ('userID', 'avatar')
 
+    def update(self, instance, validated_data):
+        instance = super().update(instance, validated_data)
+        # 只保存原图, 缩略图在后台生成
+        if validated_data.get('avatar'):
+            avatars.schedule(instance)
+        return instance
+
 
 class NotificationSerializer(serializers.ModelSerializer):
     actor = serializers.SerializerMethodField()
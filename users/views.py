@@ -9,6 +9,7 @@ from django.contrib.auth.password_validation import validate_password
 from datetime import datetime, timedelta
 from django_filters.rest_framework import DjangoFilterBackend
 
+from API import images
 from users.permissions import UserProfilePermission, UserAvatarPermission
 from users.serializers import HomeSerializer, UserRegisterSerializer, UserProfileSerializer, UserAvatarSerializer, NotificationSerializer
 from users.models import User
@@ -377,6 +378,7 @@ class UserListView(generics.ListAPIView):
     serializer_class = UserProfileSerializer
     queryset = User.objects.all()
     pagination_class = CustomPagination
+    count_cache_per_user = False
     filter_backends = [DjangoFilterBackend]
     filter_fields = {
         'userID': ['exact'],
@@ -575,7 +577,7 @@ class UserAvatarView(generics.GenericAPIView):
             tmpUser = self.get_object()
             serializer = self.serializer_class(tmpUser, request.data, partial=True, context={'request': request})
             serializer.is_valid(raise_exception=True)
-            tmpUser.avatar.delete()
+            tmpUser.avatar.delete(save=False)
             serializer.update(tmpUser, serializer.validated_data)
             user_info = serializer.data
             return JsonResponse({'status': 'success', 'user_info': user_info})
@@ -592,8 +594,10 @@ class UserAvatarView(generics.GenericAPIView):
         """
         try:
             tmpUser = self.get_object()
-            tmpUser.avatar.delete()
-            tmpUser.save()
+            tmpUser.avatar.delete(save=False)
+            images.delete_variants(tmpUser.avatar_variants)
+            tmpUser.avatar_variants = {}
+            tmpUser.save(update_fields=['avatar', 'avatar_variants'])
             return JsonResponse({'status': 'success', 'message': 'avatar deleted'})
         except Exception as e:
             return JsonResponse({'status': 'failed', 'message': str(e)})
@@ -613,6 +617,7 @@ class NotificationListView(generics.ListAPIView):
     permission_classes = [permissions.IsAuthenticated]
     serializer_class = NotificationSerializer
     pagination_class = CustomPagination
+    count_cache_per_user = True
 
     def get_queryset(self):
         return self.request.user.notifications.all()